@@ -6,6 +6,17 @@ from .models import User, MockRule, LoggedRequest
 from .routes_ui import ui_bp
 from .routes_api import api_bp
 from .routes_mock import mock_bp
+from .metrics import metrics_bp
+from .template_engine import template_cache, DEFAULT_CACHE_SIZE
+from .log_writer import log_writer
+from .log_storage import log_storage
+from .retention import log_retention
+from .schema import upgrade_schema
+from .project_cache import project_cache
+from .log_stream import log_stream
+from .log_file import log_file
+from .quotas import quotas
+from . import response_plan, rule_index, snapshot
 
 def create_app():
     app = Flask(
@@ -24,23 +35,69 @@ def create_app():
     app.logger.setLevel(logging.INFO)
     # Core config
     app.config.update({
-        "SQLALCHEMY_DATABASE_URI": os.environ["DATABASE_URL"],
+        # not needed when serving from a snapshot
+        "SQLALCHEMY_DATABASE_URI": os.environ.get("DATABASE_URL"),
         "SQLALCHEMY_TRACK_MODIFICATIONS": False,
         "SECRET_KEY":             os.environ.get("SECRET_KEY", "dev-secret-key"),
         "JWT_SECRET_KEY":         os.environ.get("JWT_SECRET_KEY"),
+        "TEMPLATE_CACHE_SIZE":    int(os.environ.get("TEMPLATE_CACHE_SIZE", DEFAULT_CACHE_SIZE)),
+        "MOCK_RANDOM_SEED":       os.environ.get("MOCK_RANDOM_SEED"),
+        "MOCK_COMPRESSION":       os.environ.get("MOCK_COMPRESSION", "1") == "1",
+        "MOCK_COMPRESS_MIN_BYTES": int(os.environ.get("MOCK_COMPRESS_MIN_BYTES", 1024)),
+        "MOCK_STREAM_MIN_BYTES":  int(os.environ.get("MOCK_STREAM_MIN_BYTES", 256 * 1024)),
+        "MOCK_SNAPSHOT":          os.environ.get("MOCK_SNAPSHOT"),
     })
+    template_cache.resize(app.config["TEMPLATE_CACHE_SIZE"])
+    response_plan.seed(app.config["MOCK_RANDOM_SEED"])
+
+    if app.config["MOCK_SNAPSHOT"]:
+        _init_snapshot_mode(app)
+        return app
 
     # Initialize extensions
     db.init_app(app)
     JWTManager(app)
+    log_writer.init_app(app)
+    log_storage.init_app(app)
+    log_file.init_app(app)
+    log_retention.init_app(app)
+    project_cache.init_app(app)
+    rule_index.init_app(app)
+    quotas.init_app(app)
+    log_stream.init_app(app)
 
     # Register your UI & API blueprints
     app.register_blueprint(ui_bp)
     app.register_blueprint(api_bp)
+    # before mock_bp so /metrics is not taken for a project name
+    app.register_blueprint(metrics_bp)
     app.register_blueprint(mock_bp)
+    app.cli.add_command(snapshot.snapshot_cli)
 
     # **Create tables once models are loaded**
     with app.app_context():
+        log_retention.create_partitioned_table()
         db.create_all()
+        upgrade_schema()
+    # started in the serving process, not here: under gunicorn this runs in
+    # the master before it forks the workers
+    app.before_request(log_retention.start)
 
     return app
+
+def _init_snapshot_mode(app):
+    """Mock traffic only, from a compiled snapshot: no database, API or UI.
+
+    Logs go to ``LOG_FILE`` (stdout unless set).
+    """
+    log_writer.init_app(app)
+    log_storage.init_app(app)
+    log_file.init_app(app, default="-")
+    project_cache.init_app(app)
+    quotas.init_app(app)
+    counts = snapshot.install(snapshot.load(app.config["MOCK_SNAPSHOT"]))
+    app.logger.info("Serving %d projects and %d rules from snapshot %s",
+                    counts["projects"], counts["rules"], app.config["MOCK_SNAPSHOT"])
+
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(mock_bp)
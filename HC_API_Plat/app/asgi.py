@@ -0,0 +1,194 @@
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+from . import create_app
+from .routes_mock import DELAY_HEADER, RATE_HEADER
+from .compression import chunked
+from .latency import pace_bytes
+
+_DELAY_HEADER = DELAY_HEADER.lower().encode("latin-1")
+_RATE_HEADER  = RATE_HEADER.lower().encode("latin-1")
+_END = object()
+
+
+class AsyncDelayApp:
+    """ASGI front for the Flask app that serves mock delays as awaited timers.
+
+    Each request runs through Flask on a small thread pool, exactly as under
+    a WSGI server. The mock blueprint does not sleep in this mode; it returns
+    the delay (and the pace of a throttled body) in internal headers and this
+    wrapper awaits them on the event loop after the thread has been
+    released, so thousands of delayed responses cost only memory.
+    """
+
+    def __init__(self, wsgi_app, threads: int = 32):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads,
+                                           thread_name_prefix="asgi-wsgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        loop = asyncio.get_running_loop()
+        environ = self._environ(scope, bytes(body))
+        status, headers, chunks = await loop.run_in_executor(
+            self.executor, self._run, environ
+        )
+
+        delay_ms = 0
+        rate     = 0
+        out_headers = []
+        for name, value in headers:
+            key = name.lower().encode("latin-1")
+            if key == _DELAY_HEADER:
+                delay_ms = int(value)
+                continue
+            if key == _RATE_HEADER:
+                rate = int(value)
+                continue
+            out_headers.append((key, value.encode("latin-1")))
+
+        try:
+            # pull the first chunk before the delay so rendering errors and
+            # template work stay off the timer
+            first = await loop.run_in_executor(self.executor, next, chunks, _END)
+            if delay_ms > 0:
+                await asyncio.sleep(delay_ms / 1000.0)
+
+            await send({
+                "type":    "http.response.start",
+                "status":  int(status.split(" ", 1)[0]),
+                "headers": out_headers,
+            })
+            start, sent = loop.time(), 0
+            chunk = first
+            while chunk is not _END:
+                if rate > 0:
+                    # keep to the rate against the start time, so slow
+                    # sends do not add up to extra delay
+                    for piece in chunked(chunk, pace_bytes(rate)):
+                        await send({"type": "http.response.body", "body": piece,
+                                    "more_body": True})
+                        sent += len(piece)
+                        wait = start + sent / rate - loop.time()
+                        if wait > 0:
+                            await asyncio.sleep(wait)
+                elif chunk:
+                    await send({"type": "http.response.body", "body": chunk,
+                                "more_body": True})
+                chunk = await loop.run_in_executor(self.executor, next, chunks, _END)
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                await loop.run_in_executor(self.executor, close)
+
+    def _run(self, environ):
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            captured["status"]  = status
+            captured["headers"] = headers
+            return lambda data: None
+
+        result = self.wsgi_app(environ, start_response)
+        chunks = iter(result)
+        if "status" not in captured:
+            # generators only call start_response on first iteration
+            first = next(chunks, _END)
+            chunks = _prepend(first, chunks)
+        return captured["status"], captured["headers"], _Closing(chunks, result)
+
+    @staticmethod
+    def _environ(scope, body: bytes) -> dict:
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD":    scope["method"],
+            "SCRIPT_NAME":       scope.get("root_path", ""),
+            "PATH_INFO":         unquote(scope["path"], errors="surrogateescape")
+                                 .encode("utf-8", "surrogateescape").decode("latin-1"),
+            "QUERY_STRING":      scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME":       server[0],
+            "SERVER_PORT":       str(server[1]),
+            "REMOTE_ADDR":       client[0],
+            "SERVER_PROTOCOL":   f"HTTP/{scope.get('http_version', '1.1')}",
+            "CONTENT_LENGTH":    str(len(body)),
+            "wsgi.version":      (1, 0),
+            "wsgi.url_scheme":   scope.get("scheme", "http"),
+            "wsgi.input":        io.BytesIO(body),
+            "wsgi.errors":       sys.stderr,
+            "wsgi.multithread":  True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once":     False,
+        }
+        for raw_name, raw_value in scope.get("headers", []):
+            name = raw_name.decode("latin-1").upper().replace("-", "_")
+            value = raw_value.decode("latin-1")
+            if name == "CONTENT_TYPE":
+                environ["CONTENT_TYPE"] = value
+                continue
+            if name == "CONTENT_LENGTH":
+                continue
+            key = f"HTTP_{name}"
+            if key in environ:
+                sep = "; " if key == "HTTP_COOKIE" else ","
+                value = f"{environ[key]}{sep}{value}"
+            environ[key] = value
+        return environ
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+class _Closing:
+    """Iterator that forwards ``close()`` to the original WSGI result."""
+
+    def __init__(self, chunks, result):
+        self._chunks = chunks
+        self._result = result
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+    def close(self):
+        close = getattr(self._result, "close", None)
+        if close:
+            close()
+
+
+def _prepend(first, chunks):
+    if first is not _END:
+        yield first
+    yield from chunks
+
+
+def create_asgi_app():
+    flask_app = create_app()
+    flask_app.config["MOCK_ASYNC_DELAYS"] = True
+    threads = int(os.environ.get("ASGI_THREADS", 32))
+    return AsyncDelayApp(flask_app, threads=threads)
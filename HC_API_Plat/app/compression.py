@@ -0,0 +1,39 @@
+import zlib
+from typing import Iterable, Iterator, Optional
+
+# server preference when the client accepts both equally
+ENCODINGS = ("gzip", "deflate")
+
+# zlib wbits for each Content-Encoding: gzip container / zlib container
+_WBITS = {"gzip": 31, "deflate": 15}
+
+
+def negotiate(accept_encodings) -> Optional[str]:
+    """Best encoding from a parsed ``Accept-Encoding`` header, or None."""
+    best, best_q = None, 0
+    for encoding in ENCODINGS:
+        q = accept_encodings[encoding]
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int = 6) -> bytes:
+    z = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    return z.compress(data) + z.flush()
+
+
+def compress_chunks(chunks: Iterable[bytes], encoding: str, level: int = 6) -> Iterator[bytes]:
+    z = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    for chunk in chunks:
+        data = z.compress(chunk)
+        if data:
+            yield data
+    yield z.flush()
+
+
+def chunked(data: bytes, size: int) -> Iterator[bytes]:
+    """Slices of ``data`` without copying the whole buffer up front."""
+    view = memoryview(data)
+    for start in range(0, len(view), size):
+        yield bytes(view[start:start + size])
@@ -1,10 +1,21 @@
 import re, json
 from typing import Optional, List
+from sqlalchemy import insert, update, text
+from sqlalchemy.orm import load_only
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask import current_app, request
 from .db import db
 from .models import User, Project, MockRule, LoggedRequest
-from .utils import normalize_project_name
+from .utils import normalize_project_name, vietnam_now, request_body_hash
+from . import rule_index
+from .rule_io import rule_key
+from .template_engine import evict_templates
+from .log_writer import log_writer
+from .project_cache import project_cache
+from .log_stream import log_stream
+from .log_storage import log_storage
+from .log_file import log_file
+from .quotas import quotas
 
 # User CRUD
 def create_user(username: str, password: str) -> User:
@@ -17,8 +28,14 @@ def create_user(username: str, password: str) -> User:
 def get_user_by_username(username: str) -> Optional[User]:
     return User.query.filter_by(username=username).first()
 
-def list_users() -> List[User]:
-    return User.query.order_by(User.id.desc()).all()
+def list_users(limit: Optional[int] = None, before_id: Optional[int] = None) -> List[User]:
+    q = User.query
+    if before_id is not None:
+        q = q.filter(User.id < before_id)
+    return q.order_by(User.id.desc()).limit(limit).all()
+
+def user_list_version() -> tuple:
+    return db.session.query(db.func.count(User.id), db.func.max(User.id)).one()
 
 def verify_user(username: str, password: str) -> Optional[User]:
     user = get_user_by_username(username)
@@ -32,10 +49,31 @@ def create_project(data: dict) -> Project:
     proj = Project(**payload)
     db.session.add(proj)
     db.session.commit()
+    project_cache.invalidate()
     return proj
 
-def list_projects() -> List[Project]:
-    return Project.query.order_by(Project.id.desc()).all()
+def list_projects(limit: Optional[int] = None, before_id: Optional[int] = None) -> List[Project]:
+    q = Project.query
+    if before_id is not None:
+        q = q.filter(Project.id < before_id)
+    return q.order_by(Project.id.desc()).limit(limit).all()
+
+def bump_project_version(project_id: int) -> None:
+    """Mark a project's rules as changed, in the caller's transaction."""
+    db.session.execute(
+        update(Project)
+        .where(Project.id == project_id)
+        .values(version=db.func.coalesce(Project.version, 0) + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def project_list_version() -> tuple:
+    """Changes whenever a project is created, renamed or deleted, or its rules change."""
+    return db.session.query(
+        db.func.count(Project.id),
+        db.func.max(Project.id),
+        db.func.coalesce(db.func.sum(db.func.coalesce(Project.version, 0)), 0),
+    ).one()
 
 def get_project(project_id: int) -> Optional[Project]:
     return Project.query.get(project_id)
@@ -46,7 +84,44 @@ def update_project(project_id: int, data: dict) -> Optional[Project]:
         return None
     proj.name        = data.get("name", proj.name)
     proj.description = data.get("description", proj.description)
+    proj.version     = (proj.version or 0) + 1
+    db.session.commit()
+    project_cache.invalidate()
+    return proj
+
+# fields only set_project_log_settings may change
+LOG_FIELDS = ("log_mode", "log_sample_n", "log_max_rows", "log_max_age_hours",
+              "log_body_max_bytes")
+
+def set_project_log_settings(project_id: int, settings: dict) -> Optional[Project]:
+    """Save validated log policy / retention fields; others are left as they are."""
+    proj = Project.query.get(project_id)
+    if not proj:
+        return None
+    for field in LOG_FIELDS:
+        if field in settings:
+            setattr(proj, field, settings[field])
+    proj.version = (proj.version or 0) + 1
     db.session.commit()
+    project_cache.invalidate()
+    return proj
+
+# fields only set_project_limits may change
+QUOTA_FIELDS = ("rate_limit_rps", "rate_limit_burst", "max_in_flight")
+
+def set_project_limits(project_id: int, rate: Optional[float], burst: Optional[int],
+                       max_in_flight: Optional[int]) -> Optional[Project]:
+    """Save validated quotas (see quotas.parse) and restart the project's counters."""
+    proj = Project.query.get(project_id)
+    if not proj:
+        return None
+    proj.rate_limit_rps   = rate
+    proj.rate_limit_burst = burst
+    proj.max_in_flight    = max_in_flight
+    proj.version          = (proj.version or 0) + 1
+    db.session.commit()
+    project_cache.invalidate()
+    quotas.reset(project_id)
     return proj
 
 def delete_project(project_id: int) -> bool:
@@ -55,15 +130,59 @@ def delete_project(project_id: int) -> bool:
         return False
     db.session.delete(proj)
     db.session.commit()
+    project_cache.invalidate()
+    rule_index.invalidate(project_id)
+    quotas.reset(project_id)
     return True
 
 # MockRule CRUD
 def create_rule(data: dict) -> MockRule:
     rule = MockRule(**data)
     db.session.add(rule)
+    bump_project_version(rule.project_id)
     db.session.commit()
+    rule_index.invalidate(rule.project_id)
     return rule
 
+def rule_keys(project_id: int) -> set:
+    """(method, path_regex, body hash) of every rule in a project, in one query."""
+    rows = db.session.query(
+        MockRule.method, MockRule.path_regex,
+        MockRule.request_body_hash, MockRule.request_body,
+    ).filter(MockRule.project_id == project_id)
+    return {
+        rule_key(m, p, h or request_body_hash(b))
+        for m, p, h, b in rows
+    }
+
+def bulk_create_rules(project_id: int, rows: List[dict], batch_size: int = 1000) -> int:
+    """Insert prepared rule rows in batches, all in one transaction."""
+    try:
+        for i in range(0, len(rows), batch_size):
+            # a missing key stays SQL NULL; an explicit None would be JSON null
+            batch = [{k: v for k, v in row.items() if v is not None}
+                     for row in rows[i:i + batch_size]]
+            db.session.execute(insert(MockRule), batch)
+        bump_project_version(project_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    rule_index.invalidate(project_id)
+    return len(rows)
+
+def list_project_rules(project_id: int,
+                       limit: Optional[int] = None,
+                       after_id: Optional[int] = None,
+                       columns: Optional[list] = None) -> List[MockRule]:
+    """A project's rules oldest first; ``columns`` loads only those attributes."""
+    q = MockRule.query.filter(MockRule.project_id == project_id)
+    if columns:
+        q = q.options(load_only(*(getattr(MockRule, c) for c in columns)))
+    if after_id is not None:
+        q = q.filter(MockRule.id > after_id)
+    return q.order_by(MockRule.id.asc()).limit(limit).all()
+
 def list_rules() -> List[MockRule]:
     return MockRule.query.order_by(MockRule.id.desc()).all()
 
@@ -74,45 +193,38 @@ def find_matching_rule(method: str, path: str, project_id: int):
     if not raw_json:
         raw_json = None
 
-    method = method.upper()
-    rules = (
-        MockRule.query
-        .filter_by(project_id=project_id, enabled=True)
-        .order_by(MockRule.created_at.asc())
-        .all()
-    )
-
-    for r in rules:
-        if r.method.upper() != method:
-            continue
-
-        try:
-            pat = re.compile(r.path_regex)
-        except re.error:
-            continue
-        if not pat.fullmatch(path):
-            continue
-
-        if r.request_body is not None:
-            if isinstance(r.request_body, dict):
-                if not isinstance(raw_json, dict) or raw_json != r.request_body:
-                    continue
-
-            elif isinstance(r.request_body, str):
-                if raw_text.strip() != r.request_body.strip():
-                    continue
-
-            else:
-                continue
+    # hash the incoming body once; only rules with a matching body hash (or
+    # no body at all) are candidates
+    body_hashes = [request_body_hash(raw_text)]
+    if isinstance(raw_json, dict):
+        body_hashes.append(request_body_hash(raw_json))
 
+    rules = rule_index.rules_for(project_id, method)
+    r = rules.match(path, body_hashes)
+    if r is None or _body_matches(r, raw_json, raw_text):
         return r
 
+    # only a body-hash collision gets here: fall back to checking every candidate
+    for r in rules.candidates(body_hashes):
+        if r.pattern.fullmatch(path) and _body_matches(r, raw_json, raw_text):
+            return r
+
     return None
 
+def _body_matches(r, raw_json, raw_text: str) -> bool:
+    if r.request_body is None:
+        return True
+    if isinstance(r.request_body, dict):
+        return isinstance(raw_json, dict) and raw_json == r.request_body
+    if isinstance(r.request_body, str):
+        return raw_text.strip() == r.request_body.strip()
+    return False
+
 def update_rule(rule_id: int, data: dict) -> Optional[MockRule]:
     rule = MockRule.query.get(rule_id)
     if not rule:
         return None
+    old_template       = rule.body_template
     rule.method        = data.get("method", rule.method)
     rule.path_regex    = data.get("path_regex", rule.path_regex)
     rule.request_body  = data.get("request_body", rule.request_body)
@@ -120,16 +232,27 @@ def update_rule(rule_id: int, data: dict) -> Optional[MockRule]:
     rule.headers       = data.get("headers", rule.headers)
     rule.body_template = data.get("body_template", rule.body_template)
     rule.delay         = data.get("delay", rule.delay)
+    rule.delay_ms      = data.get("delay_ms", rule.delay_ms)
+    rule.latency       = data.get("latency", rule.latency)
     rule.enabled       = data.get("enabled", rule.enabled)
+    bump_project_version(rule.project_id)
     db.session.commit()
+    rule_index.invalidate(rule.project_id)
+    if old_template != rule.body_template:
+        evict_templates(old_template)
     return rule
 
 def delete_rule(rule_id: int) -> bool:
     rule = MockRule.query.get(rule_id)
     if not rule:
         return False
+    project_id = rule.project_id
+    old_template = rule.body_template
     db.session.delete(rule)
+    bump_project_version(project_id)
     db.session.commit()
+    rule_index.invalidate(project_id)
+    evict_templates(old_template)
     return True
 
 def toggle_rule(rule_id: int) -> Optional[MockRule]:
@@ -137,7 +260,9 @@ def toggle_rule(rule_id: int) -> Optional[MockRule]:
     if not rule:
         return None
     rule.enabled = not rule.enabled
+    bump_project_version(rule.project_id)
     db.session.commit()
+    rule_index.invalidate(rule.project_id)
     return rule
 
 # Logs CRUD
@@ -153,38 +278,199 @@ def parse_body(raw_body: str, headers: dict):
         return parse_qs(raw_body)
     return raw_body
 
-def log_request(record: dict) -> LoggedRequest:
-    headers = record.get("headers", {})
-    raw_body = record.get("body", "")
-
-    log = LoggedRequest(
-        method=record.get("method"),
-        path=record.get("path"),
-        headers=headers,
-        query_params=record.get("query"),
-        body=parse_body(raw_body, headers),
-        raw_body=raw_body,
-        response_status=record.get("status_code"),
-        response_body=record.get("response_body"),
-        matched_rule_id=record.get("matched_rule_id"),
-        status_code=record.get("status_code")
-    )
-    db.session.add(log)
+def log_request(record: dict) -> None:
+    """Queue a mock request for the background log writer.
+
+    Falls back to a synchronous write when the writer is disabled.
+    """
+    record = {**record, "timestamp": vietnam_now()}
+    if log_writer.enabled:
+        log_writer.enqueue(record)
+    else:
+        write_logs([record])
+
+def _body_caps(records: List[dict]) -> dict:
+    """project id -> log_body_max_bytes, in one lookup per batch."""
+    project_ids = {r.get("project_id") for r in records} - {None}
+    return dict(
+        db.session.query(Project.id, Project.log_body_max_bytes)
+        .filter(Project.id.in_(project_ids))
+    ) if project_ids else {}
+
+def write_logs(records: List[dict]) -> int:
+    if not records:
+        return 0
+    if log_file.enabled and log_file.project_caps is not None:
+        # serving a snapshot: there is no database to ask
+        return log_file.write(records, log_file.project_caps)
+    caps = _body_caps(records)
+    if log_file.enabled:
+        return log_file.write(records, caps)
+
+    rows = []
+    for record in records:
+        headers = record.get("headers", {})
+        cap = log_storage.cap_for(caps.get(record.get("project_id")))
+        raw_body, request_size, req_cut = log_storage.truncate(record.get("body", ""), cap)
+        response_body, response_size, resp_cut = log_storage.truncate(
+            record.get("response_body"), cap)
+        if "response_size" in record:
+            # already cut by the mock handler (LogStorage.response_copy)
+            response_size = record["response_size"]
+            resp_cut      = resp_cut or record.get("response_truncated", False)
+
+        # a cut JSON body no longer parses; text bodies would just repeat raw_body
+        body = None if req_cut else parse_body(raw_body, headers)
+        if isinstance(body, str):
+            body = None
+        raw_body, raw_body_z           = log_storage.pack(raw_body)
+        response_body, response_body_z = log_storage.pack(response_body)
+        rows.append({
+            "timestamp":       record.get("timestamp"),
+            "project_id":      record.get("project_id"),
+            "method":          record.get("method"),
+            "path":            record.get("path"),
+            "headers":         headers,
+            "query_params":    record.get("query"),
+            "body":            body,
+            "raw_body":        raw_body,
+            "raw_body_z":      raw_body_z,
+            "request_size":    request_size,
+            "response_status": record.get("status_code"),
+            "response_body":   response_body,
+            "response_body_z": response_body_z,
+            "response_size":   response_size,
+            "truncated":       req_cut or resp_cut,
+            "matched_rule_id": record.get("matched_rule_id"),
+            "status_code":     record.get("status_code"),
+        })
+    db.session.execute(insert(LoggedRequest), rows)
+    log_stream.publish(db.session)
     db.session.commit()
+    log_stream.wake()
+    return len(rows)
 
-    # Set the limit 1000 logs in database
-    excess = LoggedRequest.query.order_by(LoggedRequest.id.desc()).offset(1000).all()
-    if excess:
-        for old in excess:
-            db.session.delete(old)
-        db.session.commit()
+def logs_query(full: bool = False):
+    q = LoggedRequest.query
+    if not full:
+        q = q.options(load_only(*(getattr(LoggedRequest, c)
+                                  for c in LoggedRequest.SUMMARY_COLUMNS)))
+    return q
+
+def get_log(log_id: int) -> Optional[LoggedRequest]:
+    return LoggedRequest.query.get(log_id)
+
+def list_logs(limit: int = 100,
+              before_id: Optional[int] = None,
+              after_id: Optional[int] = None,
+              project_id: Optional[int] = None,
+              full: bool = False) -> List[LoggedRequest]:
+    """A page of logs using id cursors instead of OFFSET.
+
+    ``before_id`` pages backwards through history, newest first.
+    ``after_id`` returns the rows right after the last one a poller has
+    seen, oldest first, so a burst larger than ``limit`` is read in order
+    rather than skipped. Only the summary columns are loaded unless
+    ``full``.
+    """
+    q = logs_query(full)
+    if project_id is not None:
+        q = q.filter(LoggedRequest.project_id == project_id)
+    if before_id is not None:
+        q = q.filter(LoggedRequest.id < before_id)
+    if after_id is not None:
+        q = q.filter(LoggedRequest.id > after_id)
+        return q.order_by(LoggedRequest.id.asc()).limit(limit).all()
+    return q.order_by(LoggedRequest.id.desc()).limit(limit).all()
+
+def count_logs(estimate: bool = False, project_id: Optional[int] = None) -> int:
+    """Row count of the logs table, from planner statistics when ``estimate``.
+
+    Per-project counts are always exact; they are served by the
+    ``(project_id, id)`` index.
+    """
+    if project_id is not None:
+        return db.session.query(db.func.count(LoggedRequest.id))\
+            .filter(LoggedRequest.project_id == project_id).scalar()
+    if estimate and db.engine.dialect.name == "postgresql":
+        # sum over partitions too, since a partitioned parent has no stats
+        approx = db.session.execute(text(
+            "SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint FROM pg_class c "
+            "WHERE c.relname = :t OR c.oid IN ("
+            "  SELECT i.inhrelid FROM pg_inherits i"
+            "  JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :t)"
+        ), {"t": LoggedRequest.__tablename__}).scalar()
+        if approx:
+            return int(approx)
+    return db.session.query(db.func.count(LoggedRequest.id)).scalar()
+
+# JSONB columns that search_logs can filter by containment
+SEARCHABLE_JSON_COLUMNS = ("body", "headers", "query_params")
+
+def search_logs(method: Optional[str] = None,
+                status_code: Optional[int] = None,
+                path_prefix: Optional[str] = None,
+                contains: Optional[dict] = None,
+                before_id: Optional[int] = None,
+                limit: int = 100,
+                project_id: Optional[int] = None,
+                full: bool = False) -> List[LoggedRequest]:
+    """Newest-first logs matching every given filter.
 
-    return log
+    ``contains`` maps a JSONB column name to a fragment the column must
+    contain (``@>``), which the GIN indexes on those columns serve.
+    """
+    q = logs_query(full)
+    if project_id is not None:
+        q = q.filter(LoggedRequest.project_id == project_id)
+    if method:
+        q = q.filter(LoggedRequest.method == method.upper())
+    if status_code is not None:
+        q = q.filter(LoggedRequest.status_code == status_code)
+    if path_prefix:
+        escaped = (path_prefix.replace("\\", "\\\\")
+                              .replace("%", "\\%")
+                              .replace("_", "\\_"))
+        q = q.filter(LoggedRequest.path.like(escaped + "%", escape="\\"))
+    for column, fragment in (contains or {}).items():
+        if column not in SEARCHABLE_JSON_COLUMNS:
+            raise ValueError(f"cannot search column {column!r}")
+        q = q.filter(getattr(LoggedRequest, column).contains(fragment))
+    if before_id is not None:
+        q = q.filter(LoggedRequest.id < before_id)
+    return q.order_by(LoggedRequest.id.desc()).limit(limit).all()
 
-def list_logs(limit: int = 100) -> List[LoggedRequest]:
-    return LoggedRequest.query.order_by(LoggedRequest.id.desc()).limit(limit).all()
+def iter_logs(project_id: Optional[int] = None,
+              method: Optional[str] = None,
+              status_code: Optional[int] = None,
+              status_class: Optional[int] = None,
+              since=None,
+              until=None,
+              batch_size: int = 1000):
+    """Oldest-first logs matching the filters, fetched ``batch_size`` rows at
+    a time through a server-side cursor so an export never holds the whole
+    result in memory.
+    """
+    q = LoggedRequest.query
+    if project_id is not None:
+        q = q.filter(LoggedRequest.project_id == project_id)
+    if method:
+        q = q.filter(LoggedRequest.method == method.upper())
+    if status_code is not None:
+        q = q.filter(LoggedRequest.status_code == status_code)
+    if status_class is not None:
+        q = q.filter(LoggedRequest.status_code >= status_class * 100,
+                     LoggedRequest.status_code < (status_class + 1) * 100)
+    if since is not None:
+        q = q.filter(LoggedRequest.timestamp >= since)
+    if until is not None:
+        q = q.filter(LoggedRequest.timestamp < until)
+    return q.order_by(LoggedRequest.id.asc()).yield_per(batch_size)
 
-def clear_logs() -> int:
-    count = LoggedRequest.query.delete()
+def clear_logs(project_id: Optional[int] = None) -> int:
+    q = LoggedRequest.query
+    if project_id is not None:
+        q = q.filter(LoggedRequest.project_id == project_id)
+    count = q.delete(synchronize_session=False)
     db.session.commit()
     return count
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""Single-pass path dispatch over a list of rules.
+
+A first-match scan calls ``fullmatch`` once per rule. ``Dispatcher`` finds
+the same winner (the earliest rule whose ``path_regex`` fully matches)
+with a handful of calls, however many rules there are:
+
+* fully literal regexes (``/health``, ``^/v1/users$``) go in a dict;
+* regexes that start with whole literal segments (``/v1/users/\\d+``) go
+  in a trie keyed by those segments, so a path only reaches the rules that
+  share its leading segments;
+* the rules at each trie node (and those without a literal prefix) are
+  joined into one alternation, in creation order, with an empty marker
+  group after each rule. ``fullmatch`` tries the alternatives left to
+  right and backtracks into the next one only if the whole path cannot
+  match, so the marker that matched names the earliest matching rule.
+
+Capturing groups inside the rules are rewritten as non-capturing ones
+(nothing reads them, and every open group makes each later branch more
+expensive to try). Patterns that cannot share one regex with others
+(backreferences, conditionals, global inline flags) are checked one by
+one.
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+_META = set(".^$*+?{}[]()|\\")
+_QUANTIFIERS = set("*+?{")
+
+# alternatives per combined regex; bounds compile time and the size of a
+# single pattern for projects with many thousands of rules
+BLOCK_SIZE = 500
+
+# things that change meaning or fail once a pattern is embedded in another
+_STANDALONE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(|\(\?[aiLmsux]+\)")
+
+
+def literal_prefix(regex: str) -> Tuple[str, bool]:
+    """``(prefix, exact)``: the literal text every match starts with, and
+    whether the regex matches nothing but that text."""
+    if _top_level_alternation(regex):
+        return "", False
+    i, n = 0, len(regex)
+    if regex.startswith("^"):
+        i = 1
+    out = []
+    while i < n:
+        c = regex[i]
+        if c == "\\":
+            nxt = regex[i + 1:i + 2]
+            if not nxt or nxt.isalnum() or nxt == "_":
+                break  # a class like \d or an anchor like \A
+            lit, step = nxt, 2
+        elif c == "$" and i == n - 1:
+            return "".join(out), True
+        elif c in _META:
+            break
+        else:
+            lit, step = c, 1
+        if regex[i + step:i + step + 1] in _QUANTIFIERS:
+            break  # the character is optional or repeated
+        out.append(lit)
+        i += step
+    return "".join(out), i == n
+
+
+def _top_level_alternation(regex: str) -> bool:
+    return any(c == "|" and depth == 0 for c, depth, _ in _scan(regex))
+
+
+def _uncapture(regex: str) -> str:
+    """``regex`` with every capturing group made non-capturing."""
+    out, last = [], 0
+    for c, _, i in _scan(regex):
+        if c != "(":
+            continue
+        if regex.startswith("?P<", i + 1):
+            end = regex.index(">", i)
+            out.append(regex[last:i] + "(?:")
+            last = end + 1
+        elif not regex.startswith("?", i + 1):
+            out.append(regex[last:i] + "(?:")
+            last = i + 1
+    out.append(regex[last:])
+    return "".join(out)
+
+
+def _scan(regex: str):
+    """``(char, group depth, index)`` for each character outside escapes and
+    character classes."""
+    depth, i, n, in_class = 0, 0, len(regex), False
+    while i < n:
+        c = regex[i]
+        if c == "\\":
+            i += 2
+            continue
+        if in_class:
+            if c == "]":
+                in_class = False
+        elif c == "[":
+            in_class = True
+            # a ] right after [ or [^ is a literal
+            if regex[i + 1:i + 2] == "^":
+                i += 1
+            if regex[i + 1:i + 2] == "]":
+                i += 1
+        else:
+            if c == ")":
+                depth -= 1
+            yield c, depth, i
+            if c == "(":
+                depth += 1
+        i += 1
+
+
+class _Group:
+    """Rules that share a trie node, matched with as few regex calls as possible."""
+
+    __slots__ = ("blocks", "standalone")
+
+    def __init__(self, rules: Sequence):
+        self.standalone = []
+        combinable = []
+        for r in rules:
+            if _STANDALONE.search(r.path_regex):
+                self.standalone.append(r)
+            else:
+                combinable.append(r)
+        self.blocks = []
+        if len(combinable) == 1:
+            # its own compiled pattern is as good as a combined one
+            self.standalone.extend(combinable)
+            self.standalone.sort(key=lambda r: r.position)
+            return
+        for start in range(0, len(combinable), BLOCK_SIZE):
+            self._add_block(combinable[start:start + BLOCK_SIZE])
+
+    def _add_block(self, rules: List) -> None:
+        try:
+            combined = re.compile("|".join(f"(?:{_uncapture(r.path_regex)})()" for r in rules))
+        except (re.error, ValueError, RecursionError, OverflowError):
+            self.standalone.extend(rules)
+            self.standalone.sort(key=lambda r: r.position)
+            return
+        # marker group i + 1 closes the i-th rule's alternative
+        self.blocks.append((combined, tuple(rules)))
+
+    def match(self, path: str):
+        best = None
+        for combined, owners in self.blocks:
+            m = combined.fullmatch(path)
+            if m is not None:
+                best = owners[m.lastindex - 1]
+                break
+        for r in self.standalone:
+            if best is not None and r.position > best.position:
+                break
+            if r.pattern.fullmatch(path):
+                best = r
+                break
+        return best
+
+
+class _Node:
+    __slots__ = ("children", "group")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.group: Optional[_Group] = None
+
+
+class Dispatcher:
+    """Finds the earliest rule (by ``position``) whose pattern fully matches a path."""
+
+    __slots__ = ("exact", "root")
+
+    def __init__(self, rules: Sequence):
+        exact: Dict[str, object] = {}
+        pending: Dict[Tuple[str, ...], list] = {}
+        for r in rules:
+            prefix, is_exact = literal_prefix(r.path_regex)
+            if is_exact:
+                exact.setdefault(prefix, r)
+                continue
+            cut = prefix.rfind("/")
+            segments = tuple(prefix[1:cut].split("/")) if prefix.startswith("/") and cut > 0 else ()
+            pending.setdefault(segments, []).append(r)
+
+        self.exact = exact
+        self.root  = _Node()
+        for segments, group_rules in pending.items():
+            node = self.root
+            for seg in segments:
+                node = node.children.setdefault(seg, _Node())
+            node.group = _Group(group_rules)
+
+    def match(self, path: str):
+        best = self.exact.get(path)
+        node = self.root
+        segments = path[1:].split("/") if path.startswith("/") else ()
+        i = 0
+        while node is not None:
+            if node.group is not None:
+                r = node.group.match(path)
+                if r is not None and (best is None or r.position < best.position):
+                    best = r
+            if i >= len(segments) - 1:
+                # deeper nodes need the path to continue past this segment
+                break
+            node = node.children.get(segments[i])
+            i += 1
+        return best
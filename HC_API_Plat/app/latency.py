@@ -0,0 +1,182 @@
+"""Latency and bandwidth profiles for mock responses.
+
+A profile is stored as JSON on a rule (``MockRule.latency``) or on a
+weighted entry (``"latency"`` key) and looks like::
+
+    {"distribution": "percentiles", "p50_ms": 40, "p95_ms": 180, "p99_ms": 600,
+     "jitter_ms": 5, "ttfb_ratio": 0.3, "bandwidth_kbps": 2000}
+
+The sampled value is the total response time. ``ttfb_ratio`` of it passes
+before the status line and headers are sent, and the body is spread over
+the rest; ``bandwidth_kbps`` (kilobits per second) additionally caps how
+fast the body goes out.
+"""
+import time
+import bisect
+from typing import Iterable, Iterator, NamedTuple, Optional
+from .compression import chunked
+
+DISTRIBUTIONS = ("fixed", "uniform", "normal", "percentiles")
+
+_FIELDS = {
+    "fixed":       ("ms",),
+    "uniform":     ("min_ms", "max_ms"),
+    "normal":      ("mean_ms", "stddev_ms"),
+    "percentiles": ("p50_ms", "p95_ms", "p99_ms"),
+}
+_OPTIONAL = ("jitter_ms", "ttfb_ratio", "bandwidth_kbps", "min_ms", "max_ms")
+
+# a paced body goes out in pieces of about this many seconds' worth of bytes
+PACE_TICK = 0.05
+
+
+class Timing(NamedTuple):
+    ttfb:     float            # seconds before the first byte
+    body:     float            # seconds to spread the body over
+    rate_bps: Optional[float]  # bandwidth cap in bytes per second
+
+    def body_rate(self, size: int) -> Optional[float]:
+        """Bytes per second to send ``size`` bytes at, or None for full speed."""
+        rates = []
+        if self.body > 0 and size:
+            rates.append(size / self.body)
+        if self.rate_bps:
+            rates.append(self.rate_bps)
+        return min(rates) if rates else None
+
+
+def _number(cfg: dict, key: str, required: bool = True) -> Optional[float]:
+    value = cfg.get(key)
+    if value is None:
+        if required:
+            raise ValueError(f"latency.{key} is required")
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"latency.{key} must be a number")
+    if value < 0:
+        raise ValueError(f"latency.{key} must be >= 0")
+    return float(value)
+
+
+def parse(cfg) -> Optional[dict]:
+    """Validate a profile from the API; returns the cleaned dict or None."""
+    if cfg is None or cfg == {}:
+        return None
+    if not isinstance(cfg, dict):
+        raise ValueError("latency must be an object")
+    dist = cfg.get("distribution", "fixed")
+    if dist not in DISTRIBUTIONS:
+        raise ValueError(f"latency.distribution must be one of {', '.join(DISTRIBUTIONS)}")
+
+    out = {"distribution": dist}
+    for key in _FIELDS[dist]:
+        out[key] = _number(cfg, key)
+    for key in _OPTIONAL:
+        if key not in out:
+            value = _number(cfg, key, required=False)
+            if value is not None:
+                out[key] = value
+
+    if out.get("ttfb_ratio", 1.0) > 1:
+        raise ValueError("latency.ttfb_ratio must be between 0 and 1")
+    if "min_ms" in out and "max_ms" in out and out["min_ms"] > out["max_ms"]:
+        raise ValueError("latency.min_ms must not exceed max_ms")
+    if dist == "percentiles" and not out["p50_ms"] <= out["p95_ms"] <= out["p99_ms"]:
+        raise ValueError("latency percentiles must satisfy p50 <= p95 <= p99")
+    return out
+
+
+def parse_rule(raw: dict) -> None:
+    """Validate ``latency`` on a rule payload and on its weighted entries, in
+    place; raises ValueError. Keys that are absent are left alone."""
+    if "latency" in raw:
+        raw["latency"] = parse(raw["latency"])
+    entries = raw.get("body_template")
+    if isinstance(entries, list):
+        for e in entries:
+            if isinstance(e, dict) and "latency" in e:
+                cfg = parse(e["latency"])
+                if cfg is None:
+                    del e["latency"]
+                else:
+                    e["latency"] = cfg
+
+
+class LatencyProfile:
+    """A parsed profile that draws one ``Timing`` per response."""
+
+    __slots__ = ("cfg", "_quantiles", "_values")
+
+    def __init__(self, cfg: dict):
+        self.cfg = cfg
+        self._quantiles = self._values = None
+        if cfg["distribution"] == "percentiles":
+            p50, p95, p99 = cfg["p50_ms"], cfg["p95_ms"], cfg["p99_ms"]
+            low  = min(cfg.get("min_ms", 0.0), p50)
+            # without an explicit max, extend the tail as far past p99 as
+            # p99 is past p95
+            high = max(cfg.get("max_ms", p99 + (p99 - p95)), p99)
+            self._quantiles = (0.0, 0.5, 0.95, 0.99, 1.0)
+            self._values    = (low, p50, p95, p99, high)
+
+    @classmethod
+    def from_config(cls, cfg) -> Optional["LatencyProfile"]:
+        """Profile for stored JSON; invalid or empty config means no profile."""
+        try:
+            cfg = parse(cfg)
+        except ValueError:
+            return None
+        return cls(cfg) if cfg else None
+
+    def _total_ms(self, rng) -> float:
+        cfg = self.cfg
+        dist = cfg["distribution"]
+        if dist == "fixed":
+            ms = cfg["ms"]
+        elif dist == "uniform":
+            ms = rng.uniform(cfg["min_ms"], cfg["max_ms"])
+        elif dist == "normal":
+            ms = rng.gauss(cfg["mean_ms"], cfg["stddev_ms"])
+        else:
+            # inverse CDF, linear between the known percentiles
+            u = rng.random()
+            i = min(bisect.bisect_right(self._quantiles, u), len(self._quantiles) - 1)
+            q0, q1 = self._quantiles[i - 1], self._quantiles[i]
+            v0, v1 = self._values[i - 1], self._values[i]
+            ms = v0 + (v1 - v0) * (u - q0) / (q1 - q0)
+        jitter = cfg.get("jitter_ms")
+        if jitter:
+            ms += rng.uniform(-jitter, jitter)
+        if "min_ms" in cfg and dist != "uniform":
+            ms = max(ms, cfg["min_ms"])
+        if "max_ms" in cfg:
+            ms = min(ms, cfg["max_ms"])
+        return max(ms, 0.0)
+
+    def sample(self, rng) -> Timing:
+        total = self._total_ms(rng) / 1000.0
+        ratio = self.cfg.get("ttfb_ratio", 1.0)
+        kbps  = self.cfg.get("bandwidth_kbps")
+        return Timing(total * ratio, total * (1 - ratio), kbps * 125 if kbps else None)
+
+
+def pace_bytes(rate_bps: float) -> int:
+    return max(int(rate_bps * PACE_TICK), 1)
+
+
+def paced(chunks: Iterable[bytes], rate_bps: float) -> Iterator[bytes]:
+    """Yield ``chunks`` at ``rate_bps``, sleeping in the worker thread.
+
+    Used when serving through plain WSGI; under ``asgi.py`` the same pacing
+    is done with awaited timers instead.
+    """
+    step  = pace_bytes(rate_bps)
+    start = time.monotonic()
+    sent  = 0
+    for chunk in chunks:
+        for piece in chunked(chunk, step):
+            yield piece
+            sent += len(piece)
+            wait = start + sent / rate_bps - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
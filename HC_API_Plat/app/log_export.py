@@ -0,0 +1,70 @@
+import io
+import csv
+import json
+import zlib
+from typing import Iterable, Iterator
+
+# rows are serialized into chunks of roughly this size before being yielded,
+# so the WSGI server writes a few large pieces instead of one per row
+CHUNK_BYTES = 64 * 1024
+
+CSV_COLUMNS = (
+    "id", "timestamp", "project_id", "method", "path", "status_code",
+    "matched_rule_id", "headers", "query", "body", "raw_body", "response_body",
+)
+
+
+def _json(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def ndjson_chunks(logs: Iterable) -> Iterator[str]:
+    """One ``LoggedRequest.to_dict()`` object per line."""
+    buf, size = [], 0
+    for log in logs:
+        line = _json(log.to_dict()) + "\n"
+        buf.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def csv_chunks(logs: Iterable) -> Iterator[str]:
+    """Flat CSV; the JSON columns are written as compact JSON strings."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    for log in logs:
+        writer.writerow((
+            log.id,
+            log.timestamp.isoformat() if log.timestamp else "",
+            log.project_id if log.project_id is not None else "",
+            log.method,
+            log.path,
+            log.status_code,
+            log.matched_rule_id if log.matched_rule_id is not None else "",
+            _json(log.headers),
+            _json(log.query_params),
+            _json(log.body),
+            log.full_raw_body or "",
+            log.full_response_body or "",
+        ))
+        if out.tell() >= CHUNK_BYTES:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue()
+
+
+def gzip_chunks(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """Compress a text stream on the fly into a single gzip member."""
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 16+15: gzip container
+    for chunk in chunks:
+        data = z.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield z.flush()
@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import threading
+from typing import Dict, List, Optional
+from .log_storage import log_storage
+
+
+class LogFile:
+    """Writes mock request logs as NDJSON to a local file instead of the DB.
+
+    Enabled by ``LOG_FILE`` (a path, or ``-`` for stdout) and used by
+    default when serving from a snapshot. Each batch from the log writer is
+    appended with a single ``write`` on a file opened with ``O_APPEND``, so
+    several worker processes can share one file without interleaving lines.
+    Bodies are cut to each project's cap like rows in the database are.
+    The file replaces database logging: log search, the live stream and
+    exports see none of these requests.
+    """
+
+    def __init__(self):
+        self.path    = None
+        self.enabled = False
+        # body caps by project id, set when serving a snapshot (no database)
+        self.project_caps: Optional[Dict[int, Optional[int]]] = None
+        self._fd     = None
+        self._pid    = None
+        self._lock   = threading.Lock()
+
+    def init_app(self, app, default: Optional[str] = None):
+        app.config.setdefault("LOG_FILE", os.environ.get("LOG_FILE", default))
+        self.path    = app.config["LOG_FILE"] or None
+        self.enabled = self.path is not None
+        app.extensions["log_file"] = self
+
+    def _open(self) -> int:
+        pid = os.getpid()
+        if self._fd is None or self._pid != pid:
+            # per process: a descriptor inherited across fork is shared
+            if self.path == "-":
+                self._fd = sys.stdout.fileno()
+            else:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._pid = pid
+        return self._fd
+
+    def _line(self, record: dict, caps: Dict[int, Optional[int]]) -> str:
+        cap = log_storage.cap_for(caps.get(record.get("project_id")))
+        raw_body, request_size, req_cut = log_storage.truncate(record.get("body", ""), cap)
+        response_body, response_size, resp_cut = log_storage.truncate(
+            record.get("response_body"), cap)
+        if "response_size" in record:
+            response_size = record["response_size"]
+            resp_cut      = resp_cut or record.get("response_truncated", False)
+        ts = record.get("timestamp")
+        return json.dumps({
+            "timestamp":       ts.isoformat() if ts else None,
+            "project_id":      record.get("project_id"),
+            "method":          record.get("method"),
+            "path":            record.get("path"),
+            "status_code":     record.get("status_code"),
+            "matched_rule_id": record.get("matched_rule_id"),
+            "headers":         record.get("headers", {}),
+            "query":           record.get("query"),
+            "raw_body":        raw_body,
+            "request_size":    request_size,
+            "response_body":   response_body,
+            "response_size":   response_size,
+            "truncated":       req_cut or resp_cut,
+        }, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def write(self, records: List[dict], caps: Dict[int, Optional[int]]) -> int:
+        """Append ``records``; ``caps`` maps project id -> body cap."""
+        if not records:
+            return 0
+        data = "".join(self._line(r, caps) for r in records).encode("utf-8")
+        with self._lock:
+            fd = self._open()
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        return len(records)
+
+
+log_file = LogFile()
@@ -0,0 +1,84 @@
+import itertools
+import threading
+from typing import Dict, Optional, Tuple
+
+# Project.log_mode values; NULL is treated as "all"
+LOG_MODES = ("all", "off", "errors", "sample", "first_n")
+
+
+class LogPolicy:
+    """Decides whether one mock request of a project gets logged.
+
+    ``sample`` logs every Nth request and ``first_n`` the first N requests
+    per rule (unmatched requests count as one rule). Counters are kept per
+    worker process, so with several workers each one keeps its own sample.
+    """
+
+    __slots__ = ("mode", "n", "_counter", "_per_rule")
+
+    def __init__(self, mode: Optional[str], n: Optional[int]):
+        self.mode      = mode or "all"
+        self.n         = max(int(n or 1), 1)
+        self._counter  = itertools.count()
+        self._per_rule: Dict[Optional[int], itertools.count] = {}
+
+    def should_log(self, rule_id: Optional[int], status_code: int) -> bool:
+        mode = self.mode
+        if mode == "all":
+            return True
+        if mode == "off":
+            return False
+        if mode == "errors":
+            return status_code >= 400
+        if mode == "sample":
+            return next(self._counter) % self.n == 0
+        if mode == "first_n":
+            counter = self._per_rule.get(rule_id)
+            if counter is None:
+                counter = self._per_rule.setdefault(rule_id, itertools.count())
+            return next(counter) < self.n
+        return True
+
+
+_ALL = LogPolicy("all", None)
+_policies: Dict[int, LogPolicy] = {}
+_lock = threading.Lock()
+
+
+def policy_for(project_id: int, mode: Optional[str], n: Optional[int]) -> LogPolicy:
+    """The project's policy, reused while its settings stay the same so the
+    sampling counters survive project cache refreshes."""
+    if not mode or mode == "all":
+        return _ALL
+    policy = _policies.get(project_id)
+    if policy is not None and (policy.mode, policy.n) == (mode, max(int(n or 1), 1)):
+        return policy
+    with _lock:
+        policy = _policies[project_id] = LogPolicy(mode, n)
+    return policy
+
+
+def reset(project_id: Optional[int] = None) -> None:
+    """Restart the sampling counters of one project, or of all projects."""
+    with _lock:
+        if project_id is None:
+            _policies.clear()
+        else:
+            _policies.pop(project_id, None)
+
+
+def parse(data: dict) -> Tuple[str, Optional[int]]:
+    """Validate ``{"mode": ..., "n": ...}`` from the API; raises ValueError."""
+    mode = data.get("mode") or "all"
+    if mode not in LOG_MODES:
+        raise ValueError(f"mode must be one of {', '.join(LOG_MODES)}")
+    n = data.get("n")
+    if mode in ("sample", "first_n"):
+        if isinstance(n, bool) or n is None:
+            raise ValueError(f"n is required for mode {mode}")
+        n = int(n)
+        if n < 1:
+            raise ValueError("n must be >= 1")
+    else:
+        n = None
+    return mode, n
@@ -0,0 +1,82 @@
+import os
+import zlib
+import hashlib
+from typing import Optional, Tuple
+
+
+class LogStorage:
+    """Keeps logged bodies small on disk.
+
+    Request and response bodies are cut to a per-project byte cap (the
+    project's ``log_body_max_bytes``, else ``LOG_BODY_MAX_BYTES``) and bodies
+    that are still large are stored zlib-compressed in the ``*_z`` columns
+    instead of the text ones. ``LoggedRequest`` decompresses them on read.
+    """
+
+    def __init__(self):
+        self.body_max_bytes     = 64 * 1024
+        self.compress_min_bytes = 1024
+        self.level              = 6
+        self.response_mode      = "truncate"
+
+    def init_app(self, app):
+        app.config.setdefault("LOG_BODY_MAX_BYTES",
+                              int(os.environ.get("LOG_BODY_MAX_BYTES", self.body_max_bytes)))
+        app.config.setdefault("LOG_COMPRESS_MIN_BYTES",
+                              int(os.environ.get("LOG_COMPRESS_MIN_BYTES", self.compress_min_bytes)))
+        app.config.setdefault("LOG_RESPONSE_BODY",
+                              os.environ.get("LOG_RESPONSE_BODY", self.response_mode))
+        self.body_max_bytes     = app.config["LOG_BODY_MAX_BYTES"]
+        self.compress_min_bytes = app.config["LOG_COMPRESS_MIN_BYTES"]
+        self.response_mode      = app.config["LOG_RESPONSE_BODY"]
+        app.extensions["log_storage"] = self
+
+    def cap_for(self, project_max_bytes: Optional[int]) -> int:
+        """Effective cap in bytes; 0 means unlimited."""
+        return self.body_max_bytes if project_max_bytes is None else project_max_bytes
+
+    @staticmethod
+    def truncate(text: Optional[str], max_bytes: int) -> Tuple[Optional[str], int, bool]:
+        """``(text, original size in bytes, truncated)``."""
+        if text is None:
+            return None, 0, False
+        data = text.encode("utf-8")
+        if not max_bytes or len(data) <= max_bytes:
+            return text, len(data), False
+        # drop a partial multi-byte character at the cut
+        return data[:max_bytes].decode("utf-8", "ignore"), len(data), True
+
+    def response_copy(self, body: bytes, max_bytes: int) -> Tuple[str, int, bool]:
+        """What to log of an encoded response: ``(text, size, partial)``.
+
+        Taken from the bytes already built for the client, so a large response
+        is never held twice: either its first ``max_bytes`` or, with
+        ``LOG_RESPONSE_BODY=hash``, just its SHA-256.
+        """
+        size = len(body)
+        if self.response_mode == "hash":
+            return "sha256:" + hashlib.sha256(body).hexdigest(), size, True
+        if not max_bytes or size <= max_bytes:
+            return body.decode("utf-8", "replace"), size, False
+        return body[:max_bytes].decode("utf-8", "ignore"), size, True
+
+    def pack(self, text: Optional[str]) -> Tuple[Optional[str], Optional[bytes]]:
+        """``(text, None)`` for small bodies, ``(None, compressed)`` for large ones."""
+        if text is None or not self.compress_min_bytes:
+            return text, None
+        data = text.encode("utf-8")
+        if len(data) < self.compress_min_bytes:
+            return text, None
+        packed = zlib.compress(data, self.level)
+        if len(packed) >= len(data):
+            return text, None
+        return None, packed
+
+    @staticmethod
+    def unpack(text: Optional[str], packed: Optional[bytes]) -> Optional[str]:
+        if packed is not None:
+            return zlib.decompress(packed).decode("utf-8")
+        return text
+
+
+log_storage = LogStorage()
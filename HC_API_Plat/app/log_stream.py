@@ -0,0 +1,278 @@
+import os
+import time
+import select
+import threading
+from collections import deque
+from typing import Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import load_only
+from .db import db
+from .models import LoggedRequest
+
+# Postgres channel the log writer notifies after each committed batch, so
+# viewers connected to any worker see rows written by every worker.
+CHANNEL = "hc_logs"
+
+# most skipped ids remembered at once; a bigger jump (a rolled-back import,
+# a sequence restart) is treated as ids that will never be used
+MAX_GAPS = 10000
+
+
+class Subscriber:
+    """One connected viewer: a bounded buffer plus its filters.
+
+    A slow client never blocks the broadcaster: when its buffer is full the
+    oldest event is dropped and ``lagged`` is set so the stream can tell the
+    client to refetch.
+    """
+
+    def __init__(self, project_id: Optional[int], method: Optional[str], maxsize: int):
+        self.project_id = project_id
+        self.method     = method.upper() if method else None
+        self.dropped    = 0
+        self.lagged     = False
+        self._buffer    = deque(maxlen=maxsize)
+        self._cond      = threading.Condition()
+
+    def wants(self, event: dict) -> bool:
+        if self.method and event["method"] != self.method:
+            return False
+        if self.project_id is not None and event.get("project_id") != self.project_id:
+            return False
+        return True
+
+    def push(self, event: dict):
+        with self._cond:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+                self.lagged = True
+            self._buffer.append(event)
+            self._cond.notify()
+
+    def get(self, timeout: float):
+        """Next event, or None after ``timeout`` seconds without one."""
+        with self._cond:
+            if not self._buffer:
+                self._cond.wait(timeout)
+            return self._buffer.popleft() if self._buffer else None
+
+
+class LogStream:
+    """Fans newly written logs out to connected SSE viewers.
+
+    A single thread per process fetches rows newer than the last id it has
+    seen and hands the serialized rows to every subscriber. It only runs
+    while someone is subscribed, and wakes on Postgres ``NOTIFY`` from the
+    log writer (or on a local write for other databases) rather than polling
+    on a timer.
+
+    Workers commit their batches concurrently, so a row can become visible
+    after one with a higher id. Ids skipped over are remembered for
+    ``settle_s`` seconds and fetched again on every pass: a row committed
+    within that time of a higher one is still sent, exactly once.
+    ``settled_id`` gives pollers the same guarantee.
+    """
+
+    def __init__(self):
+        self.app            = None
+        self.buffer_size    = 500
+        # each viewer holds a request thread for as long as it is connected
+        self.max_subscribers = 4
+        self.fallback_poll_s = 2.0
+        self._subscribers   = set()
+        self._lock          = threading.Lock()
+        self._wake          = threading.Event()
+        self._thread        = None
+        self._pid           = None
+        self._last_id       = None
+        self.settle_s       = 10.0
+        self._gaps: Dict[int, float] = {}  # skipped id -> when it was skipped
+        self._marks         = deque()      # (time, newest id) for settled_id
+        self._marks_lock    = threading.Lock()
+        self._settled       = None
+
+    def init_app(self, app):
+        app.config.setdefault("LOG_STREAM_BUFFER",
+                              int(os.environ.get("LOG_STREAM_BUFFER", self.buffer_size)))
+        app.config.setdefault("LOG_SETTLE_S",
+                              float(os.environ.get("LOG_SETTLE_S", self.settle_s)))
+        app.config.setdefault("LOG_STREAM_MAX_VIEWERS",
+                              int(os.environ.get("LOG_STREAM_MAX_VIEWERS", self.max_subscribers)))
+        self.app         = app
+        self.buffer_size = app.config["LOG_STREAM_BUFFER"]
+        self.max_subscribers = max(0, app.config["LOG_STREAM_MAX_VIEWERS"])
+        self.settle_s    = max(0.0, app.config["LOG_SETTLE_S"])
+        app.extensions["log_stream"] = self
+
+    # — subscriptions —
+    def subscribe(self, project_id: Optional[int] = None,
+                  method: Optional[str] = None) -> Optional[Subscriber]:
+        """A new viewer, or None when this process already has
+        ``max_subscribers`` (the caller should send it back to polling)."""
+        sub = Subscriber(project_id, method, self.buffer_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(sub)
+        self._ensure_started()
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    # — producer side —
+    def publish(self, session):
+        """Queue a NOTIFY in the log writer's transaction.
+
+        Postgres delivers it to listeners in every process when the batch
+        commits; call ``wake()`` after the commit for this process.
+        """
+        if db.engine.dialect.name == "postgresql":
+            session.execute(text(f"NOTIFY {CHANNEL}"))
+
+    def wake(self):
+        self._wake.set()
+
+    # — pollers —
+    def settled_id(self) -> Optional[int]:
+        """The newest id this process saw at least ``settle_s`` seconds ago
+        (None until then): rows at or below it are all visible unless a
+        batch took longer than that to commit. Must be called inside an app
+        context."""
+        now = time.monotonic()
+        with self._marks_lock:
+            if not self._marks or self._marks[-1][0] <= now - self.settle_s / 4:
+                newest = db.session.query(db.func.max(LoggedRequest.id)).scalar() or 0
+                self._marks.append((now, newest))
+            while self._marks and self._marks[0][0] <= now - self.settle_s:
+                self._settled = self._marks.popleft()[1]
+            return self._settled
+
+    # — broadcaster —
+    def _ensure_started(self):
+        pid = os.getpid()
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._start_locked()
+
+    def _start_locked(self):
+        self._thread = threading.Thread(target=self._run, name="log-stream", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        with self.app.app_context():
+            self._last_id = db.session.query(db.func.max(LoggedRequest.id)).scalar() or 0
+            self._gaps.clear()
+            db.session.remove()
+            listener = self._listen()
+            try:
+                while self._subscribers:
+                    if not self._wait(listener):
+                        continue
+                    try:
+                        self._broadcast()
+                    except Exception:
+                        self.app.logger.exception("Log stream fetch failed")
+                    finally:
+                        db.session.remove()
+            finally:
+                if listener is not None:
+                    # LISTEN state and autocommit must not leak back into the pool
+                    listener.invalidate()
+                with self._lock:
+                    self._thread = None
+                    if self._subscribers:
+                        # someone subscribed while we were shutting down
+                        self._start_locked()
+
+    def _listen(self):
+        if db.engine.dialect.name != "postgresql":
+            return None
+        conn = db.engine.raw_connection()
+        conn.driver_connection.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL}")
+        return conn
+
+    def _wait(self, listener) -> bool:
+        """Block until there may be new rows; False means just re-check subscribers."""
+        if self._wake.is_set():
+            self._wake.clear()
+            return True
+        if listener is None:
+            # no cross-process notifications: fall back to a slow poll
+            self._wake.wait(self.fallback_poll_s)
+            self._wake.clear()
+            return True
+        driver = listener.driver_connection
+        if not driver.notifies:
+            select.select([driver], [], [], self.fallback_poll_s)
+        driver.poll()
+        notified = bool(driver.notifies)
+        driver.notifies.clear()
+        if self._wake.is_set():
+            self._wake.clear()
+            notified = True
+        return notified
+
+    def _broadcast(self):
+        summary = LoggedRequest.query.options(load_only(
+            *(getattr(LoggedRequest, c) for c in LoggedRequest.SUMMARY_COLUMNS)))
+        rows = (
+            summary
+            .filter(LoggedRequest.id > self._last_id)
+            .order_by(LoggedRequest.id.asc())
+            .limit(1000)
+            .all()
+        )
+        late = []
+        if self._gaps:
+            late = (summary
+                    .filter(LoggedRequest.id.in_(list(self._gaps)))
+                    .order_by(LoggedRequest.id.asc())
+                    .all())
+            for log in late:
+                del self._gaps[log.id]
+        self._track_gaps(rows)
+        rows = late + rows
+        if not rows:
+            return
+        # viewers fetch bodies per entry from /api/logs/<id>
+        events = [log.to_summary() for log in rows]
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            for event in events:
+                if sub.wants(event):
+                    sub.push(event)
+        if len(rows) - len(late) == 1000:
+            # more waiting; don't sleep before the next fetch
+            self._wake.set()
+
+    def _track_gaps(self, rows):
+        """Remember ids skipped between ``_last_id`` and the new rows, and
+        forget those skipped more than ``settle_s`` ago."""
+        now = time.monotonic()
+        # insertion order is time order
+        while self._gaps:
+            oldest = next(iter(self._gaps))
+            if self._gaps[oldest] > now - self.settle_s:
+                break
+            del self._gaps[oldest]
+        prev = self._last_id
+        for log in rows:
+            if log.id - prev - 1 <= MAX_GAPS - len(self._gaps):
+                for i in range(prev + 1, log.id):
+                    self._gaps[i] = now
+            prev = log.id
+        self._last_id = prev
+
+
+log_stream = LogStream()
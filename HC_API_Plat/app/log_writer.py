@@ -0,0 +1,193 @@
+import os
+import atexit
+import threading
+import time
+from collections import deque
+
+DROP_OLDEST = "drop_oldest"
+BLOCK       = "block"
+
+
+class LogWriter:
+    """Background writer that drains request-log records into the DB in batches.
+
+    Records are queued by ``enqueue`` on the request path and bulk-inserted
+    by a daemon thread once ``batch_size`` records are waiting or
+    ``flush_interval_ms`` has passed. When the queue is full the
+    ``overflow_policy`` decides whether the oldest record is dropped or the
+    caller blocks until the writer catches up.
+    """
+
+    def __init__(self):
+        self.app               = None
+        self.enabled           = False
+        self.batch_size        = 200
+        self.flush_interval_ms = 250
+        self.max_queue         = 10000
+        self.overflow_policy   = DROP_OLDEST
+
+        self._queue    = deque()
+        self._cond     = threading.Condition()
+        self._thread   = None
+        self._pid      = None
+        self._stopping = False
+        self._inflight = 0
+
+        self.enqueued = 0
+        self.written  = 0
+        self.dropped  = 0
+        self.blocked  = 0
+        self.batches  = 0
+        self.errors   = 0
+
+    def init_app(self, app):
+        app.config.setdefault("LOG_WRITER_ENABLED",
+                              os.environ.get("LOG_WRITER_ENABLED", "1") == "1")
+        app.config.setdefault("LOG_BATCH_SIZE",
+                              int(os.environ.get("LOG_BATCH_SIZE", self.batch_size)))
+        app.config.setdefault("LOG_FLUSH_INTERVAL_MS",
+                              int(os.environ.get("LOG_FLUSH_INTERVAL_MS", self.flush_interval_ms)))
+        app.config.setdefault("LOG_QUEUE_SIZE",
+                              int(os.environ.get("LOG_QUEUE_SIZE", self.max_queue)))
+        app.config.setdefault("LOG_OVERFLOW_POLICY",
+                              os.environ.get("LOG_OVERFLOW_POLICY", self.overflow_policy))
+
+        policy = app.config["LOG_OVERFLOW_POLICY"]
+        if policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"LOG_OVERFLOW_POLICY must be '{DROP_OLDEST}' or '{BLOCK}'")
+
+        self.app               = app
+        self.enabled           = app.config["LOG_WRITER_ENABLED"]
+        self.batch_size        = max(1, app.config["LOG_BATCH_SIZE"])
+        self.flush_interval_ms = max(1, app.config["LOG_FLUSH_INTERVAL_MS"])
+        self.max_queue         = max(1, app.config["LOG_QUEUE_SIZE"])
+        self.overflow_policy   = policy
+        app.extensions["log_writer"] = self
+        atexit.register(self.stop)
+
+    # — producer side —
+    def enqueue(self, record: dict) -> bool:
+        """Queue a record for writing. Returns False if it had to be dropped."""
+        self._ensure_started()
+        with self._cond:
+            dropped = False
+            while len(self._queue) >= self.max_queue:
+                if self.overflow_policy == BLOCK and not self._stopping:
+                    self.blocked += 1
+                    self._cond.notify_all()
+                    self._cond.wait()
+                    continue
+                self._queue.popleft()
+                self.dropped += 1
+                dropped = True
+                break
+            self._queue.append(record)
+            self.enqueued += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+            return not dropped
+
+    # — lifecycle —
+    def _ensure_started(self):
+        # Started lazily so that pre-forking servers get one writer thread per
+        # worker process instead of a dead thread inherited from the master.
+        pid = os.getpid()
+        if self._pid != pid:
+            # forked: the queue, lock and thread all belong to the parent
+            self._queue  = deque()
+            self._cond   = threading.Condition()
+            self._thread = None
+            self._pid    = pid
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run, name="log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush everything still queued and stop the writer thread."""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        thread.join(timeout)
+        self._thread = None
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until the queue is empty and the current batch is written."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._queue or self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # — consumer side —
+    def _run(self):
+        interval = self.flush_interval_ms / 1000.0
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + interval
+                while len(self._queue) < self.batch_size and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._queue.popleft()
+                         for _ in range(min(self.batch_size, len(self._queue)))]
+                self._inflight = len(batch)
+                stopping = self._stopping and not self._queue
+                self._cond.notify_all()
+
+            if batch:
+                self._write(batch)
+            with self._cond:
+                self._inflight = 0
+                self._cond.notify_all()
+            if stopping and not batch:
+                return
+
+    def _write(self, batch):
+        from .crud import write_logs
+        from .db import db
+        with self.app.app_context():
+            try:
+                write_logs(batch)
+                self.written += len(batch)
+                self.batches += 1
+            except Exception:
+                if "sqlalchemy" in self.app.extensions:
+                    db.session.rollback()
+                self.errors += 1
+                self.app.logger.exception("Failed to write %d request logs", len(batch))
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            "enabled":         self.enabled,
+            "queued":          queued,
+            "max_queue":       self.max_queue,
+            "batch_size":      self.batch_size,
+            "flush_interval_ms": self.flush_interval_ms,
+            "overflow_policy": self.overflow_policy,
+            "enqueued":        self.enqueued,
+            "written":         self.written,
+            "dropped":         self.dropped,
+            "blocked":         self.blocked,
+            "batches":         self.batches,
+            "errors":          self.errors,
+        }
+
+
+log_writer = LogWriter()
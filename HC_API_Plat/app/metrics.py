@@ -0,0 +1,156 @@
+import os
+import time
+from flask import Blueprint, Response, g
+from prometheus_client import (
+    CollectorRegistry, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Mock requests are mostly sub-millisecond; delays push the tail to seconds.
+_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05,
+            .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+PHASE_SECONDS = Histogram(
+    "hc_mock_phase_seconds",
+    "Time spent in each phase of a mock request",
+    ["phase", "project"],
+    buckets=_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "hc_mock_request_seconds",
+    "Total mock request handling time",
+    ["project", "rule", "status"],
+    buckets=_BUCKETS,
+)
+
+metrics_bp = Blueprint("metrics", __name__)
+
+_settings = {"enabled": True, "rule_label": True, "server_timing": False}
+
+
+class PhaseTimer:
+    """Splits one mock request into consecutive timed phases."""
+
+    __slots__ = ("phases", "start", "_last", "_added")
+
+    def __init__(self):
+        self.phases = []
+        self.start  = self._last = time.perf_counter()
+        self._added = 0.0
+
+    def mark(self, phase: str):
+        """Close the phase that started at the previous mark."""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def add(self, phase: str, seconds: float):
+        """Record a phase that did not run inline (e.g. an awaited delay)."""
+        self.phases.append((phase, seconds))
+        self._added += seconds
+
+    def total(self) -> float:
+        return time.perf_counter() - self.start + self._added
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={secs * 1000:.3f}" for name, secs in self.phases)
+
+
+def start_timer():
+    if not _settings["enabled"]:
+        return None
+    timer = PhaseTimer()
+    g.mock_timer = timer
+    return timer
+
+
+def mark(phase: str):
+    timer = g.get("mock_timer")
+    if timer is not None:
+        timer.mark(phase)
+
+
+@metrics_bp.record_once
+def _setup(state):
+    app = state.app
+    app.config.setdefault("METRICS_ENABLED",
+                          os.environ.get("METRICS_ENABLED", "1") == "1")
+    app.config.setdefault("METRICS_RULE_LABEL",
+                          os.environ.get("METRICS_RULE_LABEL", "1") == "1")
+    app.config.setdefault("METRICS_SERVER_TIMING",
+                          os.environ.get("METRICS_SERVER_TIMING", "0") == "1")
+    _settings["enabled"]       = app.config["METRICS_ENABLED"]
+    _settings["rule_label"]    = app.config["METRICS_RULE_LABEL"]
+    _settings["server_timing"] = app.config["METRICS_SERVER_TIMING"]
+
+
+def observe(response):
+    """after_request hook for the mock blueprint."""
+    timer = g.pop("mock_timer", None)
+    if timer is None:
+        return response
+    project = str(g.get("mock_project_id") or "unknown")
+    rule = str(g.get("mock_rule_id") or "none") if _settings["rule_label"] else ""
+    for phase, secs in timer.phases:
+        PHASE_SECONDS.labels(phase, project).observe(secs)
+    REQUEST_SECONDS.labels(project, rule, str(response.status_code)).observe(timer.total())
+    if _settings["server_timing"]:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return response
+
+
+class _StatsCollector:
+    """Exposes the in-process cache, quota and log-writer counters."""
+
+    def collect(self):
+        from .template_engine import template_cache
+        from .log_writer import log_writer
+        from .project_cache import project_cache
+        from .quotas import quotas
+
+        t = template_cache.stats()
+        c = CounterMetricFamily("hc_template_cache", "Compiled template cache events",
+                                labels=["event"])
+        for event in ("hits", "misses", "evictions"):
+            c.add_metric([event], t[event])
+        yield c
+
+        p = project_cache.stats()
+        c = CounterMetricFamily("hc_project_cache", "Project name cache lookups",
+                                labels=["result"])
+        c.add_metric(["hit"], p["hits"])
+        c.add_metric(["negative_hit"], p["negative_hits"])
+        c.add_metric(["miss"], p["misses"])
+        yield c
+
+        q = quotas.stats()
+        c = CounterMetricFamily("hc_quota_rejections", "Mock requests refused by project quotas",
+                                labels=["reason"])
+        c.add_metric(["rate"], q["rejected_rate"])
+        c.add_metric(["concurrency"], q["rejected_concurrency"])
+        yield c
+
+        w = log_writer.stats()
+        yield GaugeMetricFamily("hc_log_queue_depth", "Logs waiting to be written",
+                                value=w["queued"])
+        c = CounterMetricFamily("hc_log_writer", "Background log writer events",
+                                labels=["event"])
+        for event in ("enqueued", "written", "dropped", "blocked", "errors"):
+            c.add_metric([event], w[event])
+        yield c
+
+
+if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    REGISTRY.register(_StatsCollector())
+
+
+@metrics_bp.route("/metrics")
+def metrics():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # aggregate the histograms of every worker process
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -5,7 +5,8 @@ from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import validates
-from .utils import normalize_project_name
+from .utils import normalize_project_name, request_body_hash
+from .log_storage import log_storage
 
 now_vietnam = datetime.utcnow() + timedelta(hours=7)
 
@@ -24,6 +25,29 @@ class Project(db.Model):
     created_at     = db.Column(db.DateTime,  default=now_vietnam)
     rules          = db.relationship("MockRule", back_populates="project")
 
+    # per-project log retention on top of the global limits; NULL = global only
+    log_max_rows      = db.Column(db.Integer, nullable=True)
+    log_max_age_hours = db.Column(db.Float, nullable=True)
+
+    # cap on each stored request/response body; NULL = LOG_BODY_MAX_BYTES,
+    # 0 = unlimited
+    log_body_max_bytes = db.Column(db.Integer, nullable=True)
+
+    # which mock requests get logged (see log_policy.py); NULL = "all".
+    # log_sample_n is the N of "sample" (1 in N) and "first_n" (per rule)
+    log_mode           = db.Column(db.String(16), nullable=True)
+    log_sample_n       = db.Column(db.Integer, nullable=True)
+
+    # mock traffic quotas (see quotas.py); NULL = unlimited. Burst defaults
+    # to one second's worth of requests
+    rate_limit_rps     = db.Column(db.Float, nullable=True)
+    rate_limit_burst   = db.Column(db.Integer, nullable=True)
+    max_in_flight      = db.Column(db.Integer, nullable=True)
+
+    # bumped on every change to the project or its rules; drives list ETags.
+    # NULL = 0
+    version           = db.Column(db.Integer, nullable=True)
+
     @validates('name')
     def _normalize_name(self, key, value):
         return normalize_project_name(value)
@@ -37,10 +61,13 @@ class MockRule(db.Model):
     method          = db.Column(db.String,  nullable=False)
     path_regex      = db.Column(db.String,  nullable=False)
     request_body    = db.Column(JSONB, nullable=True)
+    request_body_hash = db.Column(db.String(64), nullable=True)
     headers         = db.Column(JSONB, default={})
     body_template   = db.Column(JSONB, default={})
 
     delay           = db.Column(db.Integer, default=0)
+    delay_ms        = db.Column(db.Integer, default=0)
+    latency         = db.Column(JSONB, nullable=True)  # see latency.py
     status_code     = db.Column(db.Integer, default=200)
     enabled         = db.Column(db.Boolean, default=True)
     created_at      = db.Column(db.DateTime, default=now_vietnam)
@@ -49,15 +76,45 @@ class MockRule(db.Model):
     def response_type(self):
         return "weighted" if isinstance(self.body_template, list) else "single"
 
+    @validates('request_body')
+    def _hash_request_body(self, key, value):
+        self.request_body_hash = request_body_hash(value)
+        return value
+
+    @property
+    def delay_seconds(self) -> float:
+        return (self.delay or 0) + (self.delay_ms or 0) / 1000.0
+
 class LoggedRequest(db.Model):
     __tablename__      = "logs"
+    __table_args__     = (
+        # containment (@>) searches over the JSONB columns
+        db.Index("ix_logs_body_gin", "body",
+                 postgresql_using="gin", postgresql_ops={"body": "jsonb_path_ops"}),
+        db.Index("ix_logs_headers_gin", "headers",
+                 postgresql_using="gin", postgresql_ops={"headers": "jsonb_path_ops"}),
+        db.Index("ix_logs_query_params_gin", "query_params",
+                 postgresql_using="gin", postgresql_ops={"query_params": "jsonb_path_ops"}),
+        # LIKE 'prefix%' on path, newest-first filters on method / status
+        db.Index("ix_logs_path_prefix", "path",
+                 postgresql_ops={"path": "varchar_pattern_ops"}),
+        db.Index("ix_logs_method_id", "method", db.text("id DESC")),
+        db.Index("ix_logs_status_code_id", "status_code", db.text("id DESC")),
+        # per-project list / cursor paging and age retention
+        db.Index("ix_logs_project_id_id", "project_id", db.text("id DESC")),
+        db.Index("ix_logs_project_id_timestamp", "project_id", "timestamp"),
+    )
     id                 = db.Column(db.Integer, primary_key=True)
-    timestamp          = db.Column(db.DateTime, default=now_vietnam)
+    timestamp          = db.Column(db.DateTime, default=now_vietnam, index=True)
+    project_id         = db.Column(
+                           db.Integer,
+                           db.ForeignKey("projects.id", ondelete="CASCADE"),
+                           nullable=True)
     method             = db.Column(db.String, nullable=False)
     path               = db.Column(db.String, nullable=False)
     headers            = db.Column(JSONB)
     query_params       = db.Column(JSONB)
-    body               = db.Column(JSONB, nullable=True)
+    body               = db.Column(JSONB(none_as_null=True), nullable=True)
     raw_body           = db.Column(db.Text, nullable=True)
     matched_rule_id    = db.Column(
                            db.Integer,
@@ -65,4 +122,58 @@ class LoggedRequest(db.Model):
                            nullable=True)
     status_code = db.Column(db.Integer, nullable=False)
     response_status = db.Column(db.Integer, nullable=True)
-    response_body = db.Column(db.Text, nullable=True)
\ No newline at end of file
+    response_body = db.Column(db.Text, nullable=True)
+
+    # large bodies are stored compressed here instead of in the text columns
+    raw_body_z         = db.Column(db.LargeBinary, nullable=True)
+    response_body_z    = db.Column(db.LargeBinary, nullable=True)
+    # original sizes in bytes, and whether either body was cut to the cap
+    request_size       = db.Column(db.Integer, nullable=True)
+    response_size      = db.Column(db.Integer, nullable=True)
+    truncated          = db.Column(db.Boolean, nullable=True)
+
+    # what list views load; everything else is fetched per entry
+    SUMMARY_COLUMNS = (
+        "id", "project_id", "timestamp", "method", "path", "matched_rule_id",
+        "status_code", "response_status", "request_size", "response_size", "truncated",
+    )
+
+    @property
+    def full_raw_body(self):
+        return log_storage.unpack(self.raw_body, self.raw_body_z)
+
+    @property
+    def full_response_body(self):
+        return log_storage.unpack(self.response_body, self.response_body_z)
+
+    def to_summary(self) -> dict:
+        return {
+            "id":             self.id,
+            "project_id":     self.project_id,
+            "timestamp":      self.timestamp.isoformat(),
+            "method":         self.method,
+            "path":           self.path,
+            "matched_rule_id":self.matched_rule_id,
+            "response": {
+                "status": self.response_status,
+            },
+            "status_code":    self.status_code,
+            "request_size":   self.request_size,
+            "response_size":  self.response_size,
+            "truncated":      bool(self.truncated),
+        }
+
+    def to_dict(self) -> dict:
+        raw_body = self.full_raw_body
+        return {
+            **self.to_summary(),
+            "headers":        self.headers,
+            "query":          self.query_params,
+            # text bodies are only stored once, as raw_body
+            "body":           self.body if self.body is not None else raw_body,
+            "raw_body":       raw_body,
+            "response": {
+                "status": self.response_status,
+                "body":   self.full_response_body
+            },
+        }
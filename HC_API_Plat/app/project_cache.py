@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
+from .models import Project
+from .log_policy import LogPolicy, policy_for
+from .utils import normalize_project_name
+
+# Mock URLs repeat the same handful of project names, so normalization is
+# memoized; the bound keeps junk names from growing it without limit.
+normalize_cached = lru_cache(maxsize=4096)(normalize_project_name)
+
+
+class CachedProject(NamedTuple):
+    id:                 int
+    log_policy:         LogPolicy
+    log_body_max_bytes: Optional[int]
+    rate_limit_rps:     Optional[float] = None
+    rate_limit_burst:   Optional[int]   = None
+    max_in_flight:      Optional[int]   = None
+
+
+class ProjectCache:
+    """Per-process name -> project id cache for the mock hot path.
+
+    Unknown names are cached negatively for ``negative_ttl`` seconds so a
+    client hammering a missing project does not reach the database on every
+    request. Known names expire after ``ttl`` seconds so changes made by
+    other worker processes are picked up; changes made in this process
+    invalidate the cache immediately. When full, unknown names are evicted
+    before known ones, so a flood of junk names cannot push out real
+    projects.
+    """
+
+    def __init__(self):
+        self.ttl          = 30.0
+        self.negative_ttl = 5.0
+        self.max_entries  = 10000
+        self._entries     = {}
+        self._static      = None
+        self._lock        = threading.Lock()
+
+        self.hits          = 0
+        self.misses        = 0
+        self.negative_hits = 0
+
+    def init_app(self, app):
+        app.config.setdefault("PROJECT_CACHE_TTL_S",
+                              float(os.environ.get("PROJECT_CACHE_TTL_S", self.ttl)))
+        app.config.setdefault("PROJECT_NEGATIVE_TTL_S",
+                              float(os.environ.get("PROJECT_NEGATIVE_TTL_S", self.negative_ttl)))
+        self.ttl          = app.config["PROJECT_CACHE_TTL_S"]
+        self.negative_ttl = app.config["PROJECT_NEGATIVE_TTL_S"]
+        app.extensions["project_cache"] = self
+
+    def resolve(self, raw_name: str) -> Optional[int]:
+        """Project id for a name as it appears in a mock URL, or None."""
+        project = self.lookup(raw_name)
+        return project.id if project is not None else None
+
+    def lookup(self, raw_name: str) -> Optional[CachedProject]:
+        """What the mock hot path needs about a project, or None."""
+        name = normalize_cached(raw_name)
+        if self._static is not None:
+            project = self._static.get(name)
+            if project is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return project
+        now = time.monotonic()
+        entry = self._entries.get(name)
+        if entry is not None and entry[1] > now:
+            if entry[0] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        row = (
+            Project.query
+            .with_entities(Project.id, Project.log_mode, Project.log_sample_n,
+                           Project.log_body_max_bytes, Project.rate_limit_rps,
+                           Project.rate_limit_burst, Project.max_in_flight)
+            .filter_by(name=name)
+            .first()
+        )
+        project = CachedProject(row[0], policy_for(*row[:3]), *row[3:]) if row else None
+        ttl = self.ttl if project is not None else self.negative_ttl
+        with self._lock:
+            self._entries.pop(name, None)  # re-inserted last: oldest stay first
+            if len(self._entries) >= self.max_entries:
+                self._evict(now)
+            self._entries[name] = (project, now + ttl)
+        return project
+
+    def _evict(self, now: float) -> None:
+        """Make room: drop expired and negative entries, then the oldest
+        known names. Called with the lock held."""
+        entries = self._entries
+        for name in [n for n, (p, expires) in entries.items() if p is None or expires <= now]:
+            del entries[name]
+        # keep a tenth free so a miss does not pay for a full scan every time
+        excess = len(entries) - self.max_entries * 9 // 10
+        if excess > 0:
+            for name in list(entries)[:excess]:
+                del entries[name]
+
+    def install(self, projects: Dict[str, CachedProject]) -> None:
+        """Answer from ``projects`` (keyed by normalized name) only and never
+        query the database; used when serving from a snapshot."""
+        with self._lock:
+            self._entries.clear()
+            self._static = dict(projects)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size":          len(self._entries if self._static is None else self._static),
+            "hits":          self.hits,
+            "negative_hits": self.negative_hits,
+            "misses":        self.misses,
+            "ttl":           self.ttl,
+            "negative_ttl":  self.negative_ttl,
+        }
+
+
+project_cache = ProjectCache()
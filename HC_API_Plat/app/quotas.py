@@ -0,0 +1,210 @@
+import os
+import mmap
+import math
+import struct
+import time
+import multiprocessing
+from typing import Dict, Optional, Tuple
+
+# one slot per project: project id, tokens left, last refill (monotonic),
+# requests in flight
+_SLOT = struct.Struct("qddq")
+
+# slots are guarded by one of this many locks, picked by slot index
+_STRIPES = 16
+
+# owner of a slot that was never used / that was freed; probing stops at the
+# first but walks past the second, since the project it looks for may have
+# been placed after it
+_EMPTY = 0
+_FREED = -1
+
+
+class QuotaTable:
+    """Per-project token buckets and in-flight counters shared by all workers.
+
+    The table lives in an anonymous shared memory map with process-shared
+    locks, both created in ``init_app``. Under gunicorn with
+    ``preload_app`` that runs in the master, so every forked worker updates
+    the same counters; a single-process server simply has its own. Each
+    project takes one slot on its first limited request and gives it back
+    when its limits are saved again or it is deleted. When the table is
+    full, further projects are not limited rather than rejected.
+
+    A worker killed in the middle of a request (e.g. by gunicorn's
+    ``timeout``) cannot release its in-flight slot; saving the project's
+    limits resets its counters.
+    """
+
+    def __init__(self):
+        self.slots      = 4096
+        self._buf       = None
+        self._locks     = ()
+        self._claim     = None
+        self._index: Dict[int, int] = {}
+        self._index_pid = None
+
+        self.rejected_rate        = 0
+        self.rejected_concurrency = 0
+        self.unlimited_full       = 0
+
+    def init_app(self, app):
+        app.config.setdefault("QUOTA_SLOTS",
+                              int(os.environ.get("QUOTA_SLOTS", self.slots)))
+        self.slots  = max(1, app.config["QUOTA_SLOTS"])
+        self._buf   = mmap.mmap(-1, self.slots * _SLOT.size)
+        self._locks = tuple(multiprocessing.Lock() for _ in range(_STRIPES))
+        self._claim = multiprocessing.Lock()
+        self._index = {}
+        app.extensions["quotas"] = self
+
+    # — slots —
+    def _slot(self, project_id: int, claim: bool) -> Optional[int]:
+        """The project's slot, taking a free one if ``claim``; None when it
+        has none (or the table is full)."""
+        if self._index_pid != os.getpid():
+            # slot positions are shared, but this cache of them is not
+            self._index, self._index_pid = {}, os.getpid()
+        slot = self._index.get(project_id)
+        if slot is not None:
+            return slot
+        with self._claim:
+            slot = self._probe(project_id, claim)
+        if slot is not None:
+            self._index[project_id] = slot
+        return slot
+
+    def _probe(self, project_id: int, claim: bool) -> Optional[int]:
+        # called with self._claim held
+        start, free = project_id % self.slots, None
+        for i in range(self.slots):
+            slot = (start + i) % self.slots
+            owner = _SLOT.unpack_from(self._buf, slot * _SLOT.size)[0]
+            if owner == project_id:
+                return slot
+            if owner == _FREED and free is None:
+                free = slot
+            elif owner == _EMPTY:
+                if free is None:
+                    free = slot
+                break
+        if not claim or free is None:
+            return None
+        with self._locks[free % _STRIPES]:
+            _SLOT.pack_into(self._buf, free * _SLOT.size, project_id, -1.0, 0.0, 0)
+        return free
+
+    # — request path —
+    def admit(self, project_id: int, rate: Optional[float], burst: Optional[int],
+              max_in_flight: Optional[int]) -> Tuple[Optional[int], float]:
+        """``(None, 0)`` if the request may proceed (and then counts as in
+        flight until ``release``), else ``(status, retry_after_seconds)``."""
+        if self._buf is None:
+            return None, 0.0
+        for _ in range(2):
+            slot = self._slot(project_id, claim=True)
+            if slot is None:
+                self.unlimited_full += 1
+                return None, 0.0
+            result = self._admit(slot, project_id, rate, burst, max_in_flight)
+            if result is not None:
+                return result
+            # another worker freed the slot this process had cached
+            self._index.pop(project_id, None)
+        return None, 0.0
+
+    def _admit(self, slot, project_id, rate, burst, max_in_flight):
+        offset = slot * _SLOT.size
+        with self._locks[slot % _STRIPES]:
+            owner, tokens, updated, in_flight = _SLOT.unpack_from(self._buf, offset)
+            if owner != project_id:
+                return None
+            if max_in_flight and in_flight >= max_in_flight:
+                self.rejected_concurrency += 1
+                return 503, 1.0
+            now = time.monotonic()
+            if rate:
+                capacity = float(burst or max(rate, 1.0))
+                if tokens < 0:
+                    tokens = capacity  # first request since the slot was taken
+                else:
+                    tokens = min(capacity, tokens + (now - updated) * rate)
+                if tokens < 1.0:
+                    _SLOT.pack_into(self._buf, offset, project_id, tokens, now, in_flight)
+                    self.rejected_rate += 1
+                    return 429, (1.0 - tokens) / rate
+                tokens -= 1.0
+            _SLOT.pack_into(self._buf, offset, project_id, tokens, now, in_flight + 1)
+        return None, 0.0
+
+    def release(self, project_id: int) -> None:
+        slot = self._index.get(project_id)
+        if slot is None or self._buf is None:
+            return
+        offset = slot * _SLOT.size
+        with self._locks[slot % _STRIPES]:
+            pid, tokens, updated, in_flight = _SLOT.unpack_from(self._buf, offset)
+            if pid == project_id and in_flight > 0:
+                _SLOT.pack_into(self._buf, offset, pid, tokens, updated, in_flight - 1)
+
+    def reset(self, project_id: int) -> None:
+        """Forget the project's counters and give its slot back; the next
+        limited request starts with a full bucket."""
+        if self._buf is None:
+            return
+        with self._claim:
+            slot = self._probe(project_id, claim=False)
+            if slot is not None:
+                with self._locks[slot % _STRIPES]:
+                    _SLOT.pack_into(self._buf, slot * _SLOT.size, _FREED, 0.0, 0.0, 0)
+        if self._index_pid == os.getpid():
+            self._index.pop(project_id, None)
+
+    def usage(self, project_id: int) -> dict:
+        """Current counters; looking does not take a slot."""
+        if self._buf is not None:
+            with self._claim:
+                slot = self._probe(project_id, claim=False)
+            if slot is not None:
+                _, tokens, _, in_flight = _SLOT.unpack_from(self._buf, slot * _SLOT.size)
+                return {"tokens": None if tokens < 0 else round(tokens, 3),
+                        "in_flight": in_flight}
+        return {"tokens": None, "in_flight": 0}
+
+    def stats(self) -> dict:
+        return {
+            "slots":                self.slots,
+            "rejected_rate":        self.rejected_rate,
+            "rejected_concurrency": self.rejected_concurrency,
+            "unlimited_full":       self.unlimited_full,
+        }
+
+
+def retry_after_header(seconds: float) -> str:
+    # Retry-After takes whole seconds; never tell a client to retry at once
+    return str(max(1, math.ceil(seconds)))
+
+
+def parse(data: dict) -> Tuple[Optional[float], Optional[int], Optional[int]]:
+    """Validate ``{"rate_limit_rps", "burst", "max_in_flight"}`` from the API;
+    missing, null or 0 means unlimited. Raises ValueError."""
+    def number(key, cast):
+        value = data.get(key)
+        if value is None:
+            return None
+        if isinstance(value, bool):
+            raise ValueError(f"{key} must be a number")
+        value = cast(value)
+        if value < 0:
+            raise ValueError(f"{key} must be >= 0")
+        return value or None
+
+    rate          = number("rate_limit_rps", float)
+    burst         = number("burst", int)
+    max_in_flight = number("max_in_flight", int)
+    if burst is not None and rate is None:
+        raise ValueError("burst needs rate_limit_rps")
+    return rate, burst, max_in_flight
+
+
+quotas = QuotaTable()
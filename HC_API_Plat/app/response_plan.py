@@ -0,0 +1,157 @@
+import os
+import random
+from typing import Optional
+from .template_engine import render_handlebars
+from .compression import compress
+from .latency import LatencyProfile, Timing
+
+# Shared source of randomness for weighted responses. Seed it (MOCK_RANDOM_SEED)
+# to make a load test pick the same sequence of responses on every run.
+_rng = random.Random()
+_seeded = False
+
+
+def seed(value: Optional[str]) -> None:
+    global _seeded
+    _rng.seed(value)
+    _seeded = value is not None
+
+
+def _reseed_after_fork() -> None:
+    # unlike the random module's own instance, a private Random keeps its
+    # state across fork; without a configured seed every preforked worker
+    # would draw the same sequence
+    if not _seeded:
+        _rng.seed()
+
+
+os.register_at_fork(after_in_child=_reseed_after_fork)
+
+
+def entry_delay(entry: dict) -> float:
+    try:
+        return float(entry.get("delay") or 0) + float(entry.get("delay_ms") or 0) / 1000.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ResponseEntry:
+    """One possible response of a rule.
+
+    Templates without any ``{{`` cannot depend on the request, so they are
+    rendered once here and ``static`` holds the output; otherwise it is None
+    and the template is rendered per request.
+    """
+
+    __slots__ = ("template", "status_code", "headers", "delay", "latency", "static",
+                 "static_bytes", "_compressed")
+
+    def __init__(self, template: str, status_code: int, headers, delay: float,
+                 latency: Optional[LatencyProfile] = None):
+        self.template     = template
+        self.status_code  = status_code
+        self.headers      = headers
+        self.delay        = delay
+        self.latency      = latency
+        self.static       = None
+        self.static_bytes = None
+        self._compressed  = {}
+        if "{{" not in template:
+            try:
+                self.static = render_handlebars(template, {})
+            except Exception:
+                # leave it to the request so the error surfaces as a 500
+                return
+            self.static_bytes = self.static.encode("utf-8")
+
+    def compressed(self, encoding: str) -> bytes:
+        """``static_bytes`` compressed once per encoding."""
+        data = self._compressed.get(encoding)
+        if data is None:
+            data = self._compressed[encoding] = compress(self.static_bytes, encoding)
+        return data
+
+    def timing(self) -> Optional[Timing]:
+        """A fresh draw from the latency profile, or None without one."""
+        if self.latency is None:
+            return None
+        return self.latency.sample(_rng)
+
+    def render(self, context: dict) -> str:
+        if self.static is not None:
+            return self.static
+        return render_handlebars(self.template, context)
+
+
+class ResponsePlan:
+    """Precomputed responses of a rule, with O(1) weighted selection.
+
+    Weighted rules get a Vose alias table built once from the entry weights,
+    so picking a response is one random index and one coin flip no matter
+    how many entries the rule has.
+    """
+
+    __slots__ = ("entries", "_prob", "_alias")
+
+    def __init__(self, entries, weights=None):
+        self.entries = tuple(entries)
+        self._prob   = None
+        self._alias  = None
+        if weights is not None and len(self.entries) > 1:
+            self._build_alias(weights)
+
+    @classmethod
+    def for_rule(cls, rule) -> "ResponsePlan":
+        bt = rule.body_template
+        latency = LatencyProfile.from_config(rule.latency)
+        if isinstance(bt, list):
+            entries = [e for e in bt if isinstance(e, dict)]
+            return cls(
+                [ResponseEntry(
+                    e.get("template", ""),
+                    e.get("status_code", rule.status_code),
+                    e.get("headers", rule.headers),
+                    entry_delay(e),
+                    # an entry's own profile replaces the rule's
+                    LatencyProfile.from_config(e["latency"]) if e.get("latency") else latency,
+                ) for e in entries],
+                weights=[_weight(e) for e in entries],
+            )
+        tpl_str = bt.get("template", "") if isinstance(bt, dict) else ""
+        return cls([ResponseEntry(tpl_str, rule.status_code, rule.headers, rule.delay_seconds,
+                                  latency)])
+
+    def _build_alias(self, weights):
+        n = len(weights)
+        total = sum(weights)
+        if total <= 0:
+            # no usable weights: every entry is equally likely
+            weights, total = [1.0] * n, float(n)
+        scaled = [w * n / total for w in weights]
+        prob   = [1.0] * n
+        alias  = list(range(n))
+        small  = [i for i, p in enumerate(scaled) if p < 1.0]
+        large  = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s], alias[s] = scaled[s], l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # leftovers are 1.0 up to rounding
+        self._prob  = tuple(prob)
+        self._alias = tuple(alias)
+
+    def choose(self) -> Optional[ResponseEntry]:
+        if not self.entries:
+            return None
+        if self._prob is None:
+            return self.entries[0]
+        i = _rng.randrange(len(self.entries))
+        return self.entries[i] if _rng.random() < self._prob[i] else self.entries[self._alias[i]]
+
+
+def _weight(entry: dict) -> float:
+    try:
+        return max(float(entry.get("weight", 0) or 0), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
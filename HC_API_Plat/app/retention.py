@@ -0,0 +1,319 @@
+import os
+import threading
+from datetime import timedelta
+from sqlalchemy import text
+from .db import db
+from .models import LoggedRequest, Project
+from .utils import vietnam_now
+
+PARTITION_NONE  = "none"
+PARTITION_DAILY = "daily"
+
+# arbitrary constant for pg_try_advisory_xact_lock so only one worker
+# runs the retention job at a time
+_ADVISORY_LOCK_ID = 0x4C4F4753
+# held for as long as its connection lives by the one worker that runs the
+# scheduled passes; the others retry each interval and take over if it dies
+_RUNNER_LOCK_ID   = 0x4C4F4752
+
+
+class LogRetention:
+    """Periodic, set-based pruning of the ``logs`` table.
+
+    Rows are pruned by count (keep the newest ``max_rows``) and/or by age
+    (keep ``max_age_hours``) with ``DELETE ... WHERE id <= cutoff`` and
+    ``DELETE ... WHERE timestamp < threshold`` outside the request path. Projects can set tighter limits of their own
+    (``Project.log_max_rows`` / ``log_max_age_hours``). In ``daily`` partitioning mode the table is
+    range-partitioned on ``timestamp`` and expired days are dropped as whole
+    partitions instead.
+    """
+
+    def __init__(self):
+        self.app           = None
+        self.enabled       = False
+        self.max_rows      = 1000
+        self.max_age_hours = 0
+        self.interval_s    = 60
+        self.partitioning  = PARTITION_NONE
+        self.premake_days  = 2
+
+        self._thread = None
+        self._stop   = threading.Event()
+        self._pid    = None
+        self._runner = None  # True, or the connection holding _RUNNER_LOCK_ID
+
+        self.runs         = 0
+        self.deleted      = 0
+        self.dropped      = 0
+        self.errors       = 0
+        self.last_run_at  = None
+
+    def init_app(self, app):
+        app.config.setdefault("LOG_RETENTION_ENABLED",
+                              os.environ.get("LOG_RETENTION_ENABLED", "1") == "1")
+        app.config.setdefault("LOG_RETENTION_MAX_ROWS",
+                              int(os.environ.get("LOG_RETENTION_MAX_ROWS", self.max_rows)))
+        app.config.setdefault("LOG_RETENTION_MAX_AGE_HOURS",
+                              float(os.environ.get("LOG_RETENTION_MAX_AGE_HOURS", self.max_age_hours)))
+        app.config.setdefault("LOG_RETENTION_INTERVAL_S",
+                              float(os.environ.get("LOG_RETENTION_INTERVAL_S", self.interval_s)))
+        app.config.setdefault("LOG_PARTITIONING",
+                              os.environ.get("LOG_PARTITIONING", self.partitioning))
+
+        mode = app.config["LOG_PARTITIONING"]
+        if mode not in (PARTITION_NONE, PARTITION_DAILY):
+            raise ValueError(f"LOG_PARTITIONING must be '{PARTITION_NONE}' or '{PARTITION_DAILY}'")
+
+        self.app           = app
+        self.enabled       = app.config["LOG_RETENTION_ENABLED"]
+        self.max_rows      = app.config["LOG_RETENTION_MAX_ROWS"]
+        self.max_age_hours = app.config["LOG_RETENTION_MAX_AGE_HOURS"]
+        self.interval_s    = max(1.0, app.config["LOG_RETENTION_INTERVAL_S"])
+        self.partitioning  = mode
+        app.extensions["log_retention"] = self
+
+    @property
+    def partitioned(self) -> bool:
+        return self.partitioning == PARTITION_DAILY
+
+    # — schema —
+    def create_partitioned_table(self):
+        """Create ``logs`` as a table range-partitioned by day.
+
+        Must run before ``db.create_all()``, which would otherwise create a
+        plain table. Postgres requires the partition key in the primary key,
+        so the physical key is ``(id, timestamp)``; the ORM keeps using ``id``.
+        """
+        if not self.partitioned:
+            return
+        engine = db.engine
+        if engine.dialect.name != "postgresql":
+            raise RuntimeError("LOG_PARTITIONING=daily requires PostgreSQL")
+
+        table = LoggedRequest.__table__
+        # the tables logs references must exist first
+        db.metadata.create_all(
+            engine,
+            tables=[fk.column.table for fk in table.foreign_keys],
+        )
+
+        cols = []
+        for c in table.columns:
+            if c.name == "id":
+                cols.append("id SERIAL")
+                continue
+            ddl = f'"{c.name}" {c.type.compile(dialect=engine.dialect)}'
+            if not c.nullable or c.name == "timestamp":
+                ddl += " NOT NULL"
+            cols.append(ddl)
+        cols.append('PRIMARY KEY (id, "timestamp")')
+        for fk in table.foreign_keys:
+            ddl = (f"FOREIGN KEY ({fk.parent.name}) "
+                   f"REFERENCES {fk.column.table.name} ({fk.column.name})")
+            if fk.ondelete:
+                ddl += f" ON DELETE {fk.ondelete}"
+            cols.append(ddl)
+
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {table.name} (\n  "
+                + ",\n  ".join(cols)
+                + '\n) PARTITION BY RANGE ("timestamp")'
+            ))
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {table.name}_default "
+                f"PARTITION OF {table.name} DEFAULT"
+            ))
+            for idx in table.indexes:
+                idx.create(conn, checkfirst=True)
+            self._ensure_partitions(conn)
+
+    def _partition_name(self, day) -> str:
+        return f"{LoggedRequest.__tablename__}_p{day:%Y%m%d}"
+
+    def _ensure_partitions(self, conn):
+        today = vietnam_now().date()
+        for offset in range(self.premake_days + 1):
+            day = today + timedelta(days=offset)
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {self._partition_name(day)} "
+                f"PARTITION OF {LoggedRequest.__tablename__} "
+                f"FOR VALUES FROM ('{day}') TO ('{day + timedelta(days=1)}')"
+            ))
+
+    def _drop_expired_partitions(self, conn) -> int:
+        if not self.max_age_hours:
+            return 0
+        # only whole days that end before the age cutoff are dropped; the
+        # remainder is trimmed by the row-level delete below
+        cutoff_day = (vietnam_now() - timedelta(hours=self.max_age_hours)).date()
+        prefix = f"{LoggedRequest.__tablename__}_p"
+        names = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :parent"
+        ), {"parent": LoggedRequest.__tablename__}).scalars().all()
+        dropped = 0
+        for name in names:
+            if not name.startswith(prefix):
+                continue
+            if name[len(prefix):] < f"{cutoff_day:%Y%m%d}":
+                conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                dropped += 1
+        return dropped
+
+    # — pruning —
+    def prune(self) -> dict:
+        """Run one retention pass. Must be called inside an app context."""
+        deleted = dropped = 0
+        session = db.session
+        try:
+            if db.engine.dialect.name == "postgresql":
+                got_lock = session.execute(
+                    text("SELECT pg_try_advisory_xact_lock(:id)"),
+                    {"id": _ADVISORY_LOCK_ID},
+                ).scalar()
+                if not got_lock:
+                    session.rollback()
+                    return {"deleted": 0, "dropped_partitions": 0, "skipped": True}
+
+            if self.partitioned:
+                conn = session.connection()
+                self._ensure_partitions(conn)
+                dropped = self._drop_expired_partitions(conn)
+
+            deleted += self._prune_by_count(self.max_rows)
+            deleted += self._prune_by_age(self.max_age_hours)
+            projects = Project.query.filter(db.or_(
+                Project.log_max_rows.isnot(None),
+                Project.log_max_age_hours.isnot(None),
+            )).all()
+            for project in projects:
+                deleted += self._prune_project(project)
+            session.commit()
+        except Exception:
+            session.rollback()
+            self.errors += 1
+            raise
+
+        self.runs        += 1
+        self.deleted     += deleted
+        self.dropped     += dropped
+        self.last_run_at = vietnam_now()
+        return {"deleted": deleted, "dropped_partitions": dropped, "skipped": False}
+
+    def prune_project(self, project: Project) -> int:
+        """Apply a project's own limits. Must be called inside an app context."""
+        deleted = self._prune_project(project)
+        db.session.commit()
+        self.deleted += deleted
+        return deleted
+
+    def _prune_project(self, project: Project) -> int:
+        return (self._prune_by_count(project.log_max_rows, project.id)
+                + self._prune_by_age(project.log_max_age_hours, project.id))
+
+    def _delete_through(self, cutoff_id, project_id=None) -> int:
+        if cutoff_id is None:
+            return 0
+        q = LoggedRequest.query.filter(LoggedRequest.id <= cutoff_id)
+        if project_id is not None:
+            q = q.filter(LoggedRequest.project_id == project_id)
+        return q.delete(synchronize_session=False)
+
+    def _prune_by_count(self, max_rows, project_id=None) -> int:
+        if not max_rows or max_rows <= 0:
+            return 0
+        q = db.session.query(LoggedRequest.id)
+        if project_id is not None:
+            q = q.filter(LoggedRequest.project_id == project_id)
+        cutoff_id = q.order_by(LoggedRequest.id.desc())\
+            .offset(max_rows).limit(1).scalar()
+        return self._delete_through(cutoff_id, project_id)
+
+    def _prune_by_age(self, max_age_hours, project_id=None) -> int:
+        if not max_age_hours:
+            return 0
+        threshold = vietnam_now() - timedelta(hours=max_age_hours)
+        # by timestamp, not id: ids are assigned when the log writer inserts
+        # a batch, so a newer request can have a lower id than an older one
+        q = LoggedRequest.query.filter(LoggedRequest.timestamp < threshold)
+        if project_id is not None:
+            q = q.filter(LoggedRequest.project_id == project_id)
+        return q.delete(synchronize_session=False)
+
+    # — scheduler —
+    def start(self):
+        """Start the scheduler thread in this process.
+
+        Call it in each worker (gunicorn's ``post_fork``), never in a master
+        that forks afterwards: a thread does not survive ``fork`` but the
+        locks it holds do. Requests also call it, for servers without hooks.
+        """
+        if not self.enabled:
+            return
+        pid = os.getpid()
+        if self._pid != pid:
+            # forked: the thread and the runner connection belong to the parent
+            self._thread = None
+            self._runner = None
+            self._stop   = threading.Event()
+            self._pid    = pid
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="log-retention", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            with self.app.app_context():
+                try:
+                    if self._claim_runner():
+                        self.prune()
+                except Exception:
+                    self.app.logger.exception("Log retention pass failed")
+                finally:
+                    db.session.remove()
+
+    def _claim_runner(self) -> bool:
+        """Whether this process runs the scheduled passes."""
+        if self._runner is None:
+            if db.engine.dialect.name != "postgresql":
+                self._runner = True
+                return True
+            conn = db.engine.connect()
+            got = conn.execute(text("SELECT pg_try_advisory_lock(:id)"),
+                               {"id": _RUNNER_LOCK_ID}).scalar()
+            conn.commit()
+            if not got:
+                conn.close()
+                return False
+            self._runner = conn
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "enabled":       self.enabled,
+            # these describe the process that served the request
+            "pid":           os.getpid(),
+            "runner":        self._runner is not None and self._pid == os.getpid(),
+            "max_rows":      self.max_rows,
+            "max_age_hours": self.max_age_hours,
+            "interval_s":    self.interval_s,
+            "partitioning":  self.partitioning,
+            "runs":          self.runs,
+            "deleted":       self.deleted,
+            "dropped_partitions": self.dropped,
+            "errors":        self.errors,
+            "last_run_at":   self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+log_retention = LogRetention()
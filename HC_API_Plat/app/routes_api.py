@@ -1,20 +1,110 @@
-import time, json
-from flask import Blueprint, request, jsonify, abort, Response
+import time, json, hashlib
+from typing import Optional
+from urllib.parse import urlencode
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, request, jsonify, abort, Response, stream_with_context
 from flask_jwt_extended import create_access_token, jwt_required
+from sqlalchemy.exc import IntegrityError
 from .crud import (
-    create_user, verify_user, list_users,
-    create_project, list_projects, get_project,
-    update_project, delete_project,
+    create_user, verify_user, list_users, get_user_by_username, user_list_version,
+    create_project, list_projects, get_project, project_list_version,
+    update_project, delete_project, set_project_limits, QUOTA_FIELDS,
+    set_project_log_settings, LOG_FIELDS,
     create_rule, list_rules, update_rule, delete_rule,
-    find_matching_rule, toggle_rule,
-    log_request, list_logs, clear_logs
+    find_matching_rule, toggle_rule, rule_keys, bulk_create_rules,
+    list_project_rules,
+    log_request, list_logs, count_logs, clear_logs, search_logs, iter_logs,
+    logs_query, get_log,
 )
 from .models import MockRule, LoggedRequest
 from .db import db
-from .template_engine import render_handlebars
+from .template_engine import render_handlebars, template_cache
+from .log_writer import log_writer
+from .retention import log_retention
+from .project_cache import project_cache
+from .log_stream import log_stream
+from . import log_policy, latency, snapshot
+from .quotas import quotas, parse as parse_quotas
+from .log_export import ndjson_chunks, csv_chunks, gzip_chunks
+from .rule_io import (
+    FORMATS, DocumentError, export_rule, parse_document, normalize_rule,
+    rule_key, strip_base_path,
+)
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 
+# — List helpers —
+MAX_PAGE_SIZE = 1000
+
+def _list_args(getters: dict):
+    """``limit``, ``cursor`` and ``fields`` args shared by the list endpoints."""
+    limit = request.args.get("limit", type=int)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cursor = request.args.get("cursor", type=int)
+    fields = [f for f in (request.args.get("fields") or "").split(",") if f]
+    unknown = [f for f in fields if f not in getters]
+    if unknown:
+        abort(400, f"unknown fields: {', '.join(unknown)} (allowed: {', '.join(getters)})")
+    return limit, cursor, fields or list(getters)
+
+def _list_etag(*version) -> str:
+    """ETag for a list: the collection's change counter plus the query args."""
+    raw = "|".join(str(v) for v in version) + "|" + request.query_string.decode()
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+def _not_modified(etag: str):
+    if request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag, weak=True)
+        return resp
+    return None
+
+def _list_response(rows, getters: dict, fields: list, etag: str, limit: Optional[int]):
+    resp = jsonify([{f: getters[f](r) for f in fields} for r in rows])
+    resp.set_etag(etag, weak=True)
+    # let browsers keep the list but revalidate it every time
+    resp.headers["Cache-Control"] = "no-cache"
+    if limit is not None and len(rows) == limit:
+        cursor = rows[-1].id
+        resp.headers["X-Next-Cursor"] = str(cursor)
+        resp.headers["Link"] = f'<{_url_with(cursor=cursor)}>; rel="next"'
+    return resp
+
+def _url_with(**params) -> str:
+    args = request.args.to_dict()
+    args.update({k: str(v) for k, v in params.items()})
+    return f"{request.path}?{urlencode(args)}"
+
+_USER_FIELDS = {
+    "id":         lambda u: u.id,
+    "username":   lambda u: u.username,
+    "created_at": lambda u: u.created_at.isoformat(),
+}
+
+_PROJECT_FIELDS = {
+    "id":          lambda p: p.id,
+    "name":        lambda p: p.name.lower(),
+    "description": lambda p: p.description,
+    "created_at":  lambda p: p.created_at.isoformat(),
+}
+
+_RULE_FIELDS = {
+    "id":            lambda r: r.id,
+    "project_id":    lambda r: r.project_id,
+    "method":        lambda r: r.method,
+    "path_regex":    lambda r: r.path_regex,
+    "request_body":  lambda r: r.request_body,
+    "status_code":   lambda r: r.status_code,
+    "headers":       lambda r: r.headers,
+    "body_template": lambda r: r.body_template,
+    "enabled":       lambda r: r.enabled,
+    "delay":         lambda r: r.delay,
+    "delay_ms":      lambda r: r.delay_ms or 0,
+    "latency":       lambda r: r.latency,
+    "created_at":    lambda r: r.created_at.isoformat(),
+}
+
 # — Auth (JWT) —
 @api_bp.route("/auth/register", methods=["POST"])
 def api_auth_register():
@@ -23,9 +113,14 @@ def api_auth_register():
     password = data.get("password")
     if not username or not password:
         abort(400, "username and password required")
-    if any(u.username == username for u in list_users()):
+    if get_user_by_username(username):
+        abort(400, "username already exists")
+    try:
+        user = create_user(username, password)
+    except IntegrityError:
+        # registered concurrently
+        db.session.rollback()
         abort(400, "username already exists")
-    user = create_user(username, password)
     token = create_access_token(identity=user.id)
     return jsonify(access_token=token), 201
 
@@ -42,16 +137,21 @@ def api_auth_login():
 @api_bp.route("/users", methods=["GET"])
 @jwt_required()
 def api_users_list():
-    return jsonify([
-        {"id": u.id, "username": u.username, "created_at": u.created_at.isoformat()}
-        for u in list_users()
-    ])
+    """Newest first; ``limit`` + ``cursor`` page, ``fields`` picks keys."""
+    limit, cursor, fields = _list_args(_USER_FIELDS)
+    etag = _list_etag("users", *user_list_version())
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+    users = list_users(limit=limit, before_id=cursor)
+    return _list_response(users, _USER_FIELDS, fields, etag, limit)
 
 # — Projects —
 @api_bp.route("/projects", methods=["GET", "POST"])
 def api_projects():
     if request.method == "POST":
-        data = request.get_json(force=True)
+        data = _json_object()
+        _no_setting_fields(data)
         data["name"] = data["name"].strip().lower()
         proj = create_project(data)
         return jsonify({
@@ -60,12 +160,13 @@ def api_projects():
             "created_at": proj.created_at.isoformat()
         }), 201
 
-    return jsonify([{
-        "id": p.id,
-        "name": p.name.lower(),
-        "description": p.description,
-        "created_at": p.created_at.isoformat()
-    } for p in list_projects()])
+    limit, cursor, fields = _list_args(_PROJECT_FIELDS)
+    etag = _list_etag("projects", *project_list_version())
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+    projects = list_projects(limit=limit, before_id=cursor)
+    return _list_response(projects, _PROJECT_FIELDS, fields, etag, limit)
 
 @api_bp.route("/projects/<int:pid>", methods=["PUT", "DELETE"])
 def update_delete_project_api(pid):
@@ -77,7 +178,8 @@ def update_delete_project_api(pid):
         delete_project(pid)
         return "", 204
 
-    data = request.get_json(force=True)
+    data = _json_object()
+    _no_setting_fields(data)
     update_project(pid, data)
     return jsonify({
         "id": project.id,
@@ -85,11 +187,26 @@ def update_delete_project_api(pid):
         "created_at": project.created_at.isoformat()
     })
 
+def _json_object() -> dict:
+    data = request.get_json(force=True)
+    if not isinstance(data, dict):
+        abort(400, "Request body must be a JSON object")
+    return data
+
+def _no_setting_fields(data: dict):
+    # validated, and the shared counters reset, only through /limits
+    if any(f in data for f in QUOTA_FIELDS):
+        abort(400, "Set rate limits with PUT /api/projects/<id>/limits")
+    # validated only through /logs/policy and /logs/retention
+    if any(f in data for f in LOG_FIELDS):
+        abort(400, "Set log settings with PUT /api/projects/<id>/logs/policy "
+                   "or /api/projects/<id>/logs/retention")
+
 # — Rules —
 @api_bp.route("/projects/<int:pid>/rules", methods=["GET", "POST"])
 def api_rules(pid):
     # ensure project exists
-    get_project(pid) or abort(404, "Project not found")
+    project = get_project(pid) or abort(404, "Project not found")
 
     if request.method == "POST":
         raw = request.get_json(force=True)
@@ -135,17 +252,24 @@ def api_rules(pid):
 
             # clear single‐response fields
             raw["delay"]       = 0
+            raw["delay_ms"]    = 0
             raw["status_code"] = 200
             raw["headers"]     = {}
         else:
             # single response mode
             raw["body_template"] = {
                 "delay":       raw.get("delay", 0),
+                "delay_ms":    raw.get("delay_ms", 0),
                 "status_code": raw.get("status_code", 200),
                 "headers":     raw.get("headers", {}),
                 "template":    raw.get("body_template", {}).get("template", "")
             }
 
+        try:
+            latency.parse_rule(raw)
+        except ValueError as e:
+            abort(400, str(e))
+
         # check unique
         existing = MockRule.query.filter_by(
             project_id=pid,
@@ -165,25 +289,20 @@ def api_rules(pid):
             "path_regex":    rule.path_regex,
             "response_type": resp_type,
             "body_template": rule.body_template,
+            "latency":       rule.latency,
             "enabled":       rule.enabled,
             "created_at":    rule.created_at.isoformat()
         }), 201
 
-    # GET list
-    rules = MockRule.query.filter_by(project_id=pid).all()
-    return jsonify([{
-        "id":            r.id,
-        "project_id":    r.project_id,
-        "method":        r.method,
-        "path_regex":    r.path_regex,
-        "request_body":  r.request_body,
-        "status_code":   r.status_code,
-        "headers":       r.headers,
-        "body_template": r.body_template,
-        "enabled":       r.enabled,
-        "delay":         r.delay,
-        "created_at":    r.created_at.isoformat()
-    } for r in rules])
+    # GET list: oldest first (match order), paged by ``cursor`` = last id
+    limit, cursor, fields = _list_args(_RULE_FIELDS)
+    etag = _list_etag("rules", pid, project.version or 0)
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+    rules = list_project_rules(pid, limit=limit, after_id=cursor,
+                               columns=sorted(set(fields) | {"id"}))
+    return _list_response(rules, _RULE_FIELDS, fields, etag, limit)
 
 @api_bp.route("/projects/<int:pid>/rules/<int:rule_id>", methods=["PUT"])
 def api_update_rule(pid, rule_id):
@@ -222,17 +341,24 @@ def api_update_rule(pid, rule_id):
 
         raw["body_template"] = entries
         raw["delay"]        = 0
+        raw["delay_ms"]     = 0
         raw["status_code"]  = 200
         raw["headers"]      = {}
     else:
         # single response
         raw["body_template"] = {
             "delay":       raw.get("delay", 0),
+            "delay_ms":    raw.get("delay_ms", 0),
             "status_code": raw.get("status_code", 200),
             "headers":     raw.get("headers", {}),
             "template":    raw.get("body_template", {}).get("template", "")
         }
 
+    try:
+        latency.parse_rule(raw)
+    except ValueError as e:
+        abort(400, str(e))
+
     rule = update_rule(rule_id, raw)
     if not rule:
         abort(404, "Rule not found")
@@ -245,6 +371,7 @@ def api_update_rule(pid, rule_id):
         "request_body":  rule.request_body,
         "response_type": resp_type,
         "body_template": rule.body_template,
+        "latency":       rule.latency,
         "enabled":       rule.enabled,
         "created_at":    rule.created_at.isoformat()
     })
@@ -267,38 +394,451 @@ def api_toggle_rule(pid, rule_id):
         "enabled": rule.enabled
     })
 
+@api_bp.route("/projects/<int:pid>/rules/export", methods=["GET"])
+def api_export_rules(pid):
+    """All of a project's rules as a JSON array or NDJSON, oldest first."""
+    project = get_project(pid) or abort(404, "Project not found")
+    fmt = request.args.get("format", "json")
+    if fmt not in ("json", "ndjson"):
+        abort(400, "format must be json or ndjson")
+
+    query = (
+        MockRule.query
+        .filter_by(project_id=pid)
+        .order_by(MockRule.created_at.asc(), MockRule.id.asc())
+    )
+    headers = {"Content-Disposition": f'attachment; filename="{project.name}-rules.{fmt}"'}
+    if fmt == "ndjson":
+        def lines():
+            for r in query.yield_per(500):
+                yield json.dumps(export_rule(r), ensure_ascii=False) + "\n"
+        return Response(stream_with_context(lines()), mimetype="application/x-ndjson",
+                        headers=headers)
+    body = json.dumps([export_rule(r) for r in query], ensure_ascii=False, indent=2)
+    return Response(body, mimetype="application/json", headers=headers)
+
+@api_bp.route("/snapshot", methods=["GET"])
+def api_snapshot():
+    """Every project and enabled rule as a snapshot file for ``MOCK_SNAPSHOT``."""
+    compress = request.args.get("gzip", "0").lower() in ("1", "true", "yes")
+    filename = f"snapshot-{datetime.utcnow():%Y%m%d-%H%M%S}.json" + (".gz" if compress else "")
+    return Response(
+        snapshot.dumps(snapshot.build(), compress=compress),
+        mimetype="application/gzip" if compress else "application/json",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@api_bp.route("/projects/<int:pid>/rules/import", methods=["POST"])
+def api_import_rules(pid):
+    """Create many rules at once from our export, OpenAPI or HAR.
+
+    The body (or a multipart ``file``) is validated in full and checked for
+    duplicates against the project in one query; if anything is wrong
+    nothing is written. ``dry_run=1`` only reports what would happen.
+    ``on_duplicate=skip`` ignores rules that already exist (the default for
+    HAR files, which usually repeat requests) instead of failing.
+    """
+    get_project(pid) or abort(404, "Project not found")
+    fmt = request.args.get("format") or None
+    if fmt is not None and fmt not in FORMATS:
+        abort(400, f"format must be one of {', '.join(FORMATS)}")
+    dry_run   = request.args.get("dry_run", "0").lower() in ("1", "true", "yes")
+    base_path = request.args.get("base_path")
+
+    upload = request.files.get("file")
+    raw = upload.read() if upload else request.get_data()
+    try:
+        fmt, items = parse_document(raw, fmt)
+    except (DocumentError, UnicodeDecodeError) as e:
+        abort(400, str(e))
+    if base_path:
+        strip_base_path(items, base_path)
+
+    on_duplicate = request.args.get("on_duplicate", "skip" if fmt == "har" else "error")
+    if on_duplicate not in ("error", "skip"):
+        abort(400, "on_duplicate must be error or skip")
+
+    existing = rule_keys(pid)
+    rows, errors, skipped = [], [], 0
+    for i, item in enumerate(items):
+        try:
+            row = normalize_rule(item, pid)
+        except ValueError as e:
+            errors.append({"index": i, "error": str(e)})
+            continue
+        key = rule_key(row["method"], row["path_regex"], row["request_body_hash"])
+        if key in existing:
+            if on_duplicate == "skip":
+                skipped += 1
+                continue
+            errors.append({"index": i, "error": "A rule for that method + path + request body already exists"})
+            continue
+        existing.add(key)
+        rows.append(row)
+
+    result = {
+        "format":  fmt,
+        "dry_run": dry_run,
+        "total":   len(items),
+        "valid":   len(rows),
+        "skipped": skipped,
+        "created": 0,
+        "errors":  errors[:100],
+        "error_count": len(errors),
+    }
+    if errors:
+        return jsonify(result), 400
+    if not dry_run:
+        result["created"] = bulk_create_rules(pid, rows)
+    return jsonify(result), 200 if dry_run else 201
+
 # — Logs —
 @api_bp.route("/logs", methods=["GET"])
 def api_logs():
-    page  = int(request.args.get("page", 1))
-    limit = int(request.args.get("limit", 20))
-    offset = (page - 1) * limit
+    """Newest-first log summaries (``full=1`` for bodies too).
+
+    Page with ``before_id`` (older than) or poll with ``after_id`` (newer
+    than, oldest first): while ``next_after_id`` is set the page was full,
+    so fetch again from it right away; the next poll passes back
+    ``poll_after_id``. ``page`` still works but costs an OFFSET scan.
+    ``total`` is ``exact``, ``estimate`` (planner statistics) or ``none``;
+    it defaults to ``exact`` for page-based calls and ``none`` for cursor
+    calls.
+    """
+    return _logs_page(request.args.get("project_id", type=int))
+
+def _full_logs() -> bool:
+    """``full=1`` includes headers, query and bodies in list responses."""
+    return request.args.get("full", "0").lower() in ("1", "true", "yes")
+
+def _serialize_logs(logs) -> list:
+    if _full_logs():
+        return [l.to_dict() for l in logs]
+    return [l.to_summary() for l in logs]
+
+@api_bp.route("/logs/<int:log_id>", methods=["GET"])
+def api_log_detail(log_id):
+    """One log entry with its headers, query and full (decompressed) bodies."""
+    log = get_log(log_id) or abort(404, "Log not found")
+    return jsonify(log.to_dict())
+
+def _logs_page(project_id):
+    limit     = min(int(request.args.get("limit", 20)), 500)
+    before_id = request.args.get("before_id", type=int)
+    after_id  = request.args.get("after_id", type=int)
+    cursor    = before_id is not None or after_id is not None
+    total_mode = request.args.get("total", "none" if cursor else "exact")
+
+    if cursor:
+        logs = list_logs(limit, before_id=before_id, after_id=after_id,
+                         project_id=project_id, full=_full_logs())
+    else:
+        page   = int(request.args.get("page", 1))
+        offset = (page - 1) * limit
+        q      = logs_query(_full_logs())
+        if project_id is not None:
+            q = q.filter(LoggedRequest.project_id == project_id)
+        logs   = q.order_by(LoggedRequest.id.desc())\
+                    .offset(offset).limit(limit).all()
+
+    if total_mode == "none":
+        total = None
+    else:
+        total = count_logs(estimate=(total_mode == "estimate"),
+                           project_id=project_id)
 
-    total = db.session.query(db.func.count(LoggedRequest.id)).scalar()
-    logs  = LoggedRequest.query.order_by(LoggedRequest.id.desc())\
-                .offset(offset).limit(limit).all()
+    full_page = len(logs) == limit
+    if after_id is None:
+        return jsonify({
+            "logs": _serialize_logs(logs),
+            "total": total,
+            "latest_id": logs[0].id if logs else None,
+            "next_before_id": logs[-1].id if full_page else None
+        })
+
+    # polling: oldest first
+    newest = logs[-1].id if logs else after_id
+    # rows committed late by another worker can land below newest; this
+    # cursor trails far enough behind to return them (clients de-duplicate
+    # by id)
+    settled = log_stream.settled_id()
+    return jsonify({
+        "logs": _serialize_logs(logs),
+        "total": total,
+        "latest_id": newest,
+        "next_after_id": newest if full_page else None,
+        "poll_after_id": after_id if settled is None else max(after_id, min(settled, newest)),
+    })
 
+# search param prefix -> LoggedRequest JSONB column
+_LOG_JSON_PARAMS = {"body": "body", "headers": "headers", "query": "query_params"}
+
+@api_bp.route("/logs/search", methods=["GET"])
+def api_search_logs():
+    """Search logs by method, status, path prefix and JSONB content.
+
+    ``body`` / ``headers`` / ``query`` take a JSON object the stored value
+    must contain; ``body.order.id=123`` style params add a single key/value
+    (body values are parsed as JSON when possible, headers and query values
+    are always strings).
+    """
+    args = request.args
+    contains = {}
+    try:
+        for param, column in _LOG_JSON_PARAMS.items():
+            if param in args:
+                fragment = json.loads(args[param])
+                if not isinstance(fragment, dict):
+                    abort(400, f"{param} must be a JSON object")
+                contains[column] = _merge(contains.get(column, {}), fragment)
+        for key, value in args.items():
+            param, dot, path = key.partition(".")
+            if not dot or param not in _LOG_JSON_PARAMS or not path:
+                continue
+            if param == "body":
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            fragment = value
+            for part in reversed(path.split(".")):
+                fragment = {part: fragment}
+            column = _LOG_JSON_PARAMS[param]
+            contains[column] = _merge(contains.get(column, {}), fragment)
+
+        status    = args.get("status", type=int)
+        before_id = args.get("before_id", type=int)
+        limit     = min(int(args.get("limit", 50)), 500)
+    except ValueError as e:
+        abort(400, f"Invalid search parameter: {e}")
+
+    logs = search_logs(
+        method=args.get("method"),
+        status_code=status,
+        path_prefix=args.get("path_prefix"),
+        contains=contains,
+        before_id=before_id,
+        limit=limit,
+        project_id=args.get("project_id", type=int),
+        full=_full_logs(),
+    )
     return jsonify({
-        "logs": [{
-            "id":             l.id,
-            "timestamp":      l.timestamp.isoformat(),
-            "method":         l.method,
-            "path":           l.path,
-            "headers":        l.headers,
-            "query":          l.query_params,
-            "body":           l.body,
-            "raw_body":       l.raw_body,
-            "matched_rule_id":l.matched_rule_id,
-            "response": {
-                "status": l.response_status,
-                "body":   l.response_body
-            },
-            "status_code":    l.status_code
-        } for l in logs],
-        "total": total
+        "logs": _serialize_logs(logs),
+        "next_before_id": logs[-1].id if len(logs) == limit else None
+    })
+
+def _merge(base: dict, extra: dict) -> dict:
+    out = dict(base)
+    for k, v in extra.items():
+        if isinstance(v, dict) and isinstance(out.get(k), dict):
+            out[k] = _merge(out[k], v)
+        else:
+            out[k] = v
+    return out
+
+def _log_time(name: str):
+    """ISO-8601 query arg as the naive UTC+7 the logs are stored in."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        abort(400, f"{name} must be an ISO-8601 timestamp")
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone(timedelta(hours=7))).replace(tzinfo=None)
+    return ts
+
+@api_bp.route("/logs/export", methods=["GET"])
+def api_export_logs():
+    """Stream every matching log, oldest first, as NDJSON or CSV.
+
+    Filters: ``project_id``, ``method``, ``status`` (``404`` or a class like
+    ``5xx``), ``since`` / ``until`` (ISO-8601). Rows come from a server-side
+    cursor, so memory use does not grow with the export; ``gzip=1``
+    compresses the stream as it is produced.
+    """
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        abort(400, "format must be ndjson or csv")
+
+    status = (request.args.get("status") or "").lower()
+    status_code = status_class = None
+    if status:
+        if len(status) == 3 and status.endswith("xx") and status[0].isdigit():
+            status_class = int(status[0])
+        elif status.isdigit():
+            status_code = int(status)
+        else:
+            abort(400, "status must be a code like 404 or a class like 5xx")
+
+    log_writer.flush()
+    logs = iter_logs(
+        project_id=request.args.get("project_id", type=int),
+        method=request.args.get("method"),
+        status_code=status_code,
+        status_class=status_class,
+        since=_log_time("since"),
+        until=_log_time("until"),
+    )
+    chunks   = ndjson_chunks(logs) if fmt == "ndjson" else csv_chunks(logs)
+    mimetype = "application/x-ndjson" if fmt == "ndjson" else "text/csv"
+    filename = f"logs-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    if request.args.get("gzip", "0").lower() in ("1", "true", "yes"):
+        chunks, mimetype, filename = gzip_chunks(chunks), "application/gzip", filename + ".gz"
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Accel-Buffering":   "no",
     })
 
 @api_bp.route("/logs", methods=["DELETE"])
 def api_clear_logs():
-    deleted = clear_logs()
-    return jsonify({"deleted": deleted}), 200
\ No newline at end of file
+    log_writer.flush()
+    deleted = clear_logs(request.args.get("project_id", type=int))
+    return jsonify({"deleted": deleted}), 200
+
+# — Project-scoped logs —
+@api_bp.route("/projects/<int:pid>/logs", methods=["GET", "DELETE"])
+def api_project_logs(pid):
+    get_project(pid) or abort(404, "Project not found")
+    if request.method == "DELETE":
+        log_writer.flush()
+        return jsonify({"deleted": clear_logs(pid)}), 200
+    return _logs_page(pid)
+
+@api_bp.route("/projects/<int:pid>/logs/retention", methods=["GET", "PUT", "POST"])
+def api_project_log_retention(pid):
+    """Read or set a project's own log limits; POST prunes it right away.
+
+    ``max_body_bytes`` caps each stored request/response body (``null`` =
+    ``LOG_BODY_MAX_BYTES``, ``0`` = unlimited) and is only changed when sent.
+    """
+    project = get_project(pid) or abort(404, "Project not found")
+    if request.method == "PUT":
+        data = _json_object()
+        try:
+            settings = {
+                "log_max_rows":      None if data.get("max_rows") is None
+                                     else int(data["max_rows"]),
+                "log_max_age_hours": None if data.get("max_age_hours") is None
+                                     else float(data["max_age_hours"]),
+            }
+            if "max_body_bytes" in data:
+                settings["log_body_max_bytes"] = (None if data["max_body_bytes"] is None
+                                                  else max(int(data["max_body_bytes"]), 0))
+        except (TypeError, ValueError):
+            abort(400, "max_rows and max_body_bytes must be integers and max_age_hours a number")
+        project = set_project_log_settings(pid, settings)
+    elif request.method == "POST":
+        log_writer.flush()
+        return jsonify({"deleted": log_retention.prune_project(project)})
+    return jsonify({
+        "project_id":    project.id,
+        "max_rows":      project.log_max_rows,
+        "max_age_hours": project.log_max_age_hours,
+        "max_body_bytes": project.log_body_max_bytes,
+    })
+
+@api_bp.route("/projects/<int:pid>/logs/policy", methods=["GET", "PUT"])
+def api_project_log_policy(pid):
+    """Which mock requests of a project are logged.
+
+    ``mode`` is ``all``, ``off``, ``errors`` (status >= 400), ``sample``
+    (every ``n``th request) or ``first_n`` (the first ``n`` per rule).
+    Saving restarts the sampling counters.
+    """
+    project = get_project(pid) or abort(404, "Project not found")
+    if request.method == "PUT":
+        try:
+            mode, n = log_policy.parse(_json_object())
+        except (TypeError, ValueError) as e:
+            abort(400, str(e))
+        project = set_project_log_settings(pid, {"log_mode": mode, "log_sample_n": n})
+        log_policy.reset(pid)
+    return jsonify({
+        "project_id": project.id,
+        "mode":       project.log_mode or "all",
+        "n":          project.log_sample_n,
+    })
+
+@api_bp.route("/projects/<int:pid>/limits", methods=["GET", "PUT"])
+def api_project_limits(pid):
+    """Mock traffic quotas of a project.
+
+    ``rate_limit_rps`` with an optional ``burst`` (token bucket; over it the
+    mock answers 429) and ``max_in_flight`` (concurrent requests; over it
+    503). Null or 0 means unlimited. Saving resets the project's counters.
+    """
+    project = get_project(pid) or abort(404, "Project not found")
+    if request.method == "PUT":
+        try:
+            rate, burst, max_in_flight = parse_quotas(_json_object())
+        except (TypeError, ValueError) as e:
+            abort(400, str(e))
+        project = set_project_limits(pid, rate, burst, max_in_flight)
+    return jsonify({
+        "project_id":     project.id,
+        "rate_limit_rps": project.rate_limit_rps,
+        "burst":          project.rate_limit_burst,
+        "max_in_flight":  project.max_in_flight,
+        "usage":          quotas.usage(pid),
+    })
+
+@api_bp.route("/logs/stream", methods=["GET"])
+def api_logs_stream():
+    """Server-Sent Events stream of newly written logs.
+
+    Optional ``project_id`` and ``method`` filters. A ``lagged`` event means
+    the client fell behind and events were dropped, so it should refetch.
+    Each viewer holds a worker thread, so past ``LOG_STREAM_MAX_VIEWERS``
+    per worker the answer is 503 and the client should poll instead.
+    """
+    project_id = request.args.get("project_id", type=int)
+    method     = request.args.get("method")
+    sub = log_stream.subscribe(project_id=project_id, method=method)
+    if sub is None:
+        return Response("Too many live log viewers; poll /api/logs instead\n", 503,
+                        mimetype="text/plain", headers={"Retry-After": "30"})
+
+    def events():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = sub.get(timeout=15)
+                if sub.lagged:
+                    sub.lagged = False
+                    yield "event: lagged\ndata: {}\n\n"
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: log\ndata: {json.dumps(event)}\n\n"
+        finally:
+            log_stream.unsubscribe(sub)
+
+    resp = Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control":     "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    # also when the generator never started, or the viewer slot would leak
+    resp.call_on_close(lambda: log_stream.unsubscribe(sub))
+    return resp
+
+@api_bp.route("/logs/retention", methods=["GET", "POST"])
+def api_log_retention():
+    if request.method == "POST":
+        log_writer.flush()
+        return jsonify(log_retention.prune())
+    return jsonify(log_retention.stats())
+
+@api_bp.route("/logs/writer", methods=["GET"])
+def api_log_writer_stats():
+    return jsonify(log_writer.stats())
+
+# — Caches —
+@api_bp.route("/cache/templates", methods=["GET"])
+def api_template_cache_stats():
+    return jsonify(template_cache.stats())
+
+@api_bp.route("/cache/projects", methods=["GET"])
+def api_project_cache_stats():
+    return jsonify(project_cache.stats())
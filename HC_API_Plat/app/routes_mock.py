@@ -1,81 +1,177 @@
-from flask import Blueprint, request, abort, jsonify, Response
+from flask import Blueprint, request, abort, jsonify, Response, current_app, g
 import time
-from .models import Project
+from . import metrics
 from .crud import find_matching_rule, log_request
-from .template_engine import render_handlebars
-from .utils import normalize_project_name
+from .project_cache import project_cache
+from .log_storage import log_storage
+from .compression import negotiate, compress, compress_chunks, chunked
+from .latency import paced
+from .quotas import quotas, retry_after_header
 
 mock_bp = Blueprint("mock", __name__)
+mock_bp.after_request(metrics.observe)
+
+# Internal headers carrying the delay and the body pace (bytes per second) to
+# the ASGI server (see asgi.py), which awaits them instead of sleeping in a
+# worker thread and strips them before sending.
+DELAY_HEADER = "X-HC-Delay-Ms"
+RATE_HEADER  = "X-HC-Rate-Bps"
+
+STREAM_CHUNK_BYTES = 64 * 1024
 
 @mock_bp.route("/<project_name>/", defaults={"mock_path": ""}, methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 @mock_bp.route("/<project_name>/<path:mock_path>", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 def dynamic_mock(project_name, mock_path):
-    project_name = normalize_project_name(project_name)
-    project = Project.query.filter_by(name=project_name).first()
-    if not project:
+    timer = metrics.start_timer()
+    project = project_cache.lookup(project_name)
+    metrics.mark("project_lookup")
+    if project is None:
         abort(404, "Project not found")
+    project_id = project.id
+    g.mock_project_id = project_id
 
-    full_path = "/" + mock_path
-    method    = request.method
-    headers   = dict(request.headers)
-    query     = request.args.to_dict()
-    raw_body  = request.get_data(as_text=True)
+    if not (project.rate_limit_rps or project.max_in_flight):
+        return _serve(project, mock_path, timer)
+
+    # quotas come before any rule matching, rendering or logging so a
+    # project over its limits costs almost nothing
+    status, retry_after = quotas.admit(project_id, project.rate_limit_rps,
+                                       project.rate_limit_burst, project.max_in_flight)
+    metrics.mark("quota")
+    if status is not None:
+        message = "Rate limit exceeded" if status == 429 else "Too many requests in flight"
+        return Response(message, status=status, mimetype="text/plain",
+                        headers={"Retry-After": retry_after_header(retry_after)})
     try:
-        body_json = request.get_json(force=True)
-    except:
-        body_json = {}
+        resp = _serve(project, mock_path, timer)
+    except BaseException:
+        quotas.release(project_id)
+        raise
+    # in flight until the body has been sent, including awaited delays
+    resp.call_on_close(lambda: quotas.release(project_id))
+    return resp
+
+def _serve(project, mock_path, timer) -> Response:
+    """Match, render, delay and log one mock request of ``project``."""
+    project_id = project.id
+    full_path  = "/" + mock_path
+    method     = request.method
 
-    rule = find_matching_rule(method, full_path, project.id)
+    rule = find_matching_rule(method, full_path, project_id)
+    metrics.mark("rule_match")
     if not rule:
+        if project.log_policy.should_log(None, 404):
+            _log(project_id, full_path, None, 404, "No matching rule")
+            metrics.mark("log")
         abort(404, "No matching rule")
 
-    # Delay if single mode or per-entry
-    if not isinstance(rule.body_template, list) and rule.delay:
-        time.sleep(rule.delay)
-
-    context = {
-        "body":      body_json,
-        "query":     query,
-        "headers":   headers,
-        "path":      full_path,
-        "method":    method,
-        "raw_body":  raw_body,
-    }
-
-    bt = rule.body_template
-    if isinstance(bt, list):
-        import random
-        choice = random.choices(
-            bt,
-            weights=[e.get("weight", 0) for e in bt],
-            k=1
-        )[0]
-        tpl_str     = choice.get("template", "")
-        status_code = choice.get("status_code", rule.status_code)
-        headers_out = choice.get("headers", rule.headers)
+    entry = rule.plan.choose()
+    if entry is None:
+        abort(500, "Rule has no responses")
+
+    if entry.static is not None:
+        # context-free template: rendered once when the rule was indexed
+        body = entry.static_bytes
     else:
-        # Single‐response
-        tpl_str     = bt.get("template", "")
-        status_code = rule.status_code
-        headers_out = rule.headers
+        try:
+            body_json = request.get_json(force=True)
+        except:
+            body_json = {}
+        context = {
+            "body":      body_json,
+            "query":     request.args.to_dict(),
+            "headers":   dict(request.headers),
+            "path":      full_path,
+            "method":    method,
+            "raw_body":  request.get_data(as_text=True),
+        }
+        try:
+            body = entry.render(context).encode("utf-8")
+        except Exception as e:
+            abort(500, f"Template error: {e}")
 
+    resp = _response(entry, body)
+    g.mock_rule_id = rule.id
+    metrics.mark("render")
 
-    try:
-        content = render_handlebars(tpl_str, context)
-    except Exception as e:
-        abort(500, f"Template error: {e}")
+    # Delay if single mode or per-entry, plus the latency profile's draw:
+    # time to first byte, then the body paced over the rest
+    delay = entry.delay
+    rate  = None
+    timing = entry.timing()
+    if timing is not None:
+        delay += timing.ttfb
+        rate   = timing.body_rate(resp.content_length or len(body))
+    async_delays = current_app.config.get("MOCK_ASYNC_DELAYS")
+    if delay > 0:
+        if async_delays:
+            resp.headers[DELAY_HEADER] = str(round(delay * 1000))
+            if timer is not None:
+                timer.add("delay", delay)
+        else:
+            time.sleep(delay)
+            metrics.mark("delay")
+    if rate:
+        if async_delays:
+            resp.headers[RATE_HEADER] = str(round(rate))
+        else:
+            resp.response = paced(resp.response, rate)
+        if timer is not None:
+            timer.add("throttle", (resp.content_length or len(body)) / rate)
+
+    if project.log_policy.should_log(rule.id, resp.status_code):
+        cap = log_storage.cap_for(project.log_body_max_bytes)
+        response_body, size, partial = log_storage.response_copy(body, cap)
+        _log(project_id, full_path, rule.id, resp.status_code, response_body,
+             response_size=size, response_truncated=partial)
+        metrics.mark("log")
 
-    resp = Response(content, status=status_code, headers=headers_out)
+    return resp
+
+def _response(entry, body: bytes) -> Response:
+    """Wrap the rendered body, compressed for the client and/or streamed.
+
+    Bodies of at least ``MOCK_COMPRESS_MIN_BYTES`` are gzip/deflate encoded
+    when the client accepts it (static bodies are compressed once and
+    reused), and bodies of at least ``MOCK_STREAM_MIN_BYTES`` are sent in
+    chunks without a Content-Length.
+    """
+    config = current_app.config
+    resp   = Response(status=entry.status_code, headers=entry.headers)
+    stream = 0 < config["MOCK_STREAM_MIN_BYTES"] <= len(body)
+
+    encoding = None
+    if (config["MOCK_COMPRESSION"] and len(body) >= config["MOCK_COMPRESS_MIN_BYTES"]
+            and "Content-Encoding" not in resp.headers):
+        resp.vary.add("Accept-Encoding")
+        encoding = negotiate(request.accept_encodings)
+
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+        if body is entry.static_bytes:
+            body = entry.compressed(encoding)
+        elif stream:
+            resp.response = compress_chunks(chunked(body, STREAM_CHUNK_BYTES), encoding)
+            return resp
+        else:
+            body = compress(body, encoding)
+
+    if stream:
+        resp.response = chunked(body, STREAM_CHUNK_BYTES)
+    else:
+        resp.set_data(body)
+    return resp
 
+def _log(project_id, path, rule_id, status_code, response_body, **extra):
     log_request({
-        "method":        method,
-        "path":          full_path,
-        "headers":       headers,
-        "query":         query,
-        "body":          raw_body,
-        "matched_rule_id": rule.id,
-        "status_code":   resp.status_code,
-        "response_body": content
-    })
-
-    return resp
\ No newline at end of file
+        "project_id":    project_id,
+        "method":        request.method,
+        "path":          path,
+        "headers":       dict(request.headers),
+        "query":         request.args.to_dict(),
+        "body":          request.get_data(as_text=True),
+        "matched_rule_id": rule_id,
+        "status_code":   status_code,
+        "response_body": response_body,
+        **extra
+    })
\ No newline at end of file
@@ -0,0 +1,227 @@
+import os
+import re
+import time
+import heapq
+import threading
+from typing import Dict, Iterable, List, Optional
+from .models import MockRule, Project
+from .utils import request_body_hash
+from .response_plan import ResponsePlan
+from .dispatch import Dispatcher
+
+# Per-process index of enabled rules: project_id -> method -> rules in
+# creation order. Built lazily from the DB on the first hit for a project,
+# or installed whole from a snapshot (see snapshot.py). Every rule change
+# bumps ``Project.version``: the worker that made it drops its entry at
+# once, the others notice the new version within ``check_interval``.
+_index: Dict[int, "_Entry"] = {}
+# guards the dicts only; rebuilds hold their project's lock, so a large
+# project compiling does not stall lookups of the others
+_lock = threading.Lock()
+_project_locks: Dict[int, threading.Lock] = {}
+# bumped by invalidate(); a rebuild that overlapped one is re-checked
+_generation = 0
+# set by install(): the index is complete and the DB is never read
+_frozen = False
+# seconds an entry is trusted before its project's version is read again
+check_interval = 2.0
+
+# version of a project that no longer exists
+_GONE = object()
+
+
+def init_app(app):
+    global check_interval
+    app.config.setdefault("RULE_INDEX_CHECK_S",
+                          float(os.environ.get("RULE_INDEX_CHECK_S", check_interval)))
+    check_interval = max(0.0, app.config["RULE_INDEX_CHECK_S"])
+
+
+class CompiledRule:
+    """Detached, read-only snapshot of a MockRule with its regex compiled
+    and its responses precomputed."""
+
+    __slots__ = (
+        "id", "project_id", "method", "path_regex", "pattern",
+        "request_body", "headers", "body_template",
+        "delay", "delay_ms", "status_code", "created_at",
+        "latency", "body_hash", "position", "plan",
+    )
+
+    def __init__(self, rule: MockRule, pattern, position: int):
+        self.id            = rule.id
+        self.project_id    = rule.project_id
+        self.method        = rule.method.upper()
+        self.path_regex    = rule.path_regex
+        self.pattern       = pattern
+        self.request_body  = rule.request_body
+        self.headers       = rule.headers
+        self.body_template = rule.body_template
+        self.delay         = rule.delay
+        self.delay_ms      = rule.delay_ms
+        self.status_code   = rule.status_code
+        self.created_at    = rule.created_at
+        self.latency       = rule.latency
+        self.body_hash     = rule.request_body_hash or request_body_hash(rule.request_body)
+        self.position      = position
+        self.plan          = ResponsePlan.for_rule(self)
+
+    @property
+    def response_type(self):
+        return "weighted" if isinstance(self.body_template, list) else "single"
+
+    @property
+    def delay_seconds(self) -> float:
+        return (self.delay or 0) + (self.delay_ms or 0) / 1000.0
+
+
+class MethodRules:
+    """Rules for one project + method, split by how they match the body.
+
+    Rules without a request body are candidates for every request; rules
+    with one are found by the canonical body hash, so a request only looks
+    at the rules that can match it. ``match`` runs each candidate list
+    through a ``Dispatcher``; ``candidates`` yields them in creation order
+    for a plain first-match scan. Either way the earliest-created rule
+    wins.
+    """
+
+    __slots__ = ("any_body", "by_body_hash", "_dispatchers")
+
+    def __init__(self, rules: List[CompiledRule]):
+        any_body: List[CompiledRule] = []
+        by_body_hash: Dict[str, List[CompiledRule]] = {}
+        for r in rules:
+            if r.request_body is None:
+                any_body.append(r)
+            elif r.body_hash is not None:
+                by_body_hash.setdefault(r.body_hash, []).append(r)
+            # other body types can never match a request
+        self.any_body     = tuple(any_body)
+        self.by_body_hash = {h: tuple(rs) for h, rs in by_body_hash.items()}
+        # body-specific lists get theirs on first use
+        self._dispatchers = {None: Dispatcher(self.any_body)}
+
+    def _dispatcher(self, body_hash: str) -> Dispatcher:
+        d = self._dispatchers.get(body_hash)
+        if d is None:
+            d = self._dispatchers[body_hash] = Dispatcher(self.by_body_hash[body_hash])
+        return d
+
+    def match(self, path: str, body_hashes: Iterable[str]) -> Optional[CompiledRule]:
+        """Earliest candidate whose ``path_regex`` fully matches ``path``."""
+        best = self._dispatchers[None].match(path) if self.any_body else None
+        for h in body_hashes:
+            if h in self.by_body_hash:
+                r = self._dispatcher(h).match(path)
+                if r is not None and (best is None or r.position < best.position):
+                    best = r
+        return best
+
+    def candidates(self, body_hashes: Iterable[str]) -> Iterable[CompiledRule]:
+        lists = [self.by_body_hash[h] for h in body_hashes if h in self.by_body_hash]
+        if not lists:
+            return self.any_body
+        if self.any_body:
+            lists.append(self.any_body)
+        if len(lists) == 1:
+            return lists[0]
+        return heapq.merge(*lists, key=lambda r: r.position)
+
+
+_EMPTY = MethodRules([])
+
+
+class _Entry:
+    __slots__ = ("version", "checked", "methods")
+
+    def __init__(self, version, checked: float, methods: Dict[str, MethodRules]):
+        self.version = version
+        self.checked = checked
+        self.methods = methods
+
+
+def _version(project_id: int):
+    row = Project.query.with_entities(Project.version).filter_by(id=project_id).first()
+    return _GONE if row is None else row[0]
+
+
+def _build(project_id: int) -> Dict[str, MethodRules]:
+    rules = (
+        MockRule.query
+        .filter_by(project_id=project_id, enabled=True)
+        .order_by(MockRule.created_at.asc(), MockRule.id.asc())
+        .all()
+    )
+    return compile_rules(rules)
+
+
+def compile_rules(rules: Iterable) -> Dict[str, MethodRules]:
+    """Index rule rows (anything with MockRule's attributes) given in match order."""
+    by_method: Dict[str, List[CompiledRule]] = {}
+    for position, r in enumerate(rules):
+        try:
+            pat = re.compile(r.path_regex)
+        except re.error:
+            continue
+        compiled = CompiledRule(r, pat, position)
+        by_method.setdefault(compiled.method, []).append(compiled)
+    return {m: MethodRules(rs) for m, rs in by_method.items()}
+
+
+def rules_for(project_id: int, method: str) -> MethodRules:
+    """Enabled rules for a project + method, earliest created first."""
+    entry = _index.get(project_id)
+    if entry is None or entry.checked + check_interval <= time.monotonic():
+        entry = _refresh(project_id)
+        if entry is None:
+            return _EMPTY
+    return entry.methods.get(method.upper(), _EMPTY)
+
+
+def _refresh(project_id: int) -> Optional[_Entry]:
+    if _frozen:
+        return _index.get(project_id)
+    with _lock:
+        project_lock = _project_locks.setdefault(project_id, threading.Lock())
+    with project_lock:
+        now = time.monotonic()
+        entry = _index.get(project_id)
+        if entry is not None and entry.checked + check_interval > now:
+            return entry  # another thread just checked
+        generation = _generation
+        # read the version before the rules: a change committed in between
+        # is picked up again on the next check rather than missed
+        version = _version(project_id)
+        if entry is not None and entry.version == version:
+            entry.checked = now
+            return entry
+        entry = _Entry(version, now, _build(project_id))
+        with _lock:
+            if _generation != generation:
+                entry.checked = 0.0  # may predate the invalidation: check again
+            _index[project_id] = entry
+        return entry
+
+
+def install(indexes: Dict[int, Dict[str, MethodRules]]) -> None:
+    """Serve exactly these projects' rules from now on, without the DB."""
+    global _frozen
+    with _lock:
+        _index.clear()
+        _index.update({pid: _Entry(None, float("inf"), methods)
+                       for pid, methods in indexes.items()})
+        _frozen = True
+
+
+def invalidate(project_id: Optional[int] = None) -> None:
+    """Drop the cached rules for one project, or for all projects."""
+    global _generation
+    if _frozen:
+        return
+    with _lock:
+        _generation += 1
+        if project_id is None:
+            _index.clear()
+        else:
+            _index.pop(project_id, None)
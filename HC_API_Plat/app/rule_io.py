@@ -0,0 +1,374 @@
+"""Bulk rule import/export.
+
+Every supported input (our own JSON/NDJSON export, OpenAPI 3 / Swagger 2,
+HAR) is turned into plain rule rows and validated in full before anything
+is written, so an import either creates every rule or none of them.
+"""
+import re
+import json
+import base64
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+from .utils import request_body_hash
+from .latency import parse as parse_latency
+
+FORMATS = ("json", "ndjson", "openapi", "har")
+
+# methods the mock blueprint answers
+METHODS = ("GET", "POST", "PUT", "DELETE", "PATCH")
+
+# recorded response headers that would be wrong when replayed by the mock
+_HAR_SKIP_HEADERS = {
+    "content-length", "content-encoding", "transfer-encoding", "connection",
+    "keep-alive", "date", "set-cookie", "server",
+}
+
+
+class DocumentError(ValueError):
+    """The uploaded document could not be read at all."""
+
+
+def export_rule(rule) -> dict:
+    """A rule in the shape ``normalize_rule`` (and the import API) accepts."""
+    return {
+        "method":        rule.method,
+        "path_regex":    rule.path_regex,
+        "request_body":  rule.request_body,
+        "response_type": rule.response_type,
+        "status_code":   rule.status_code,
+        "headers":       rule.headers or {},
+        "body_template": rule.body_template,
+        "delay":         rule.delay or 0,
+        "delay_ms":      rule.delay_ms or 0,
+        "latency":       rule.latency,
+        "enabled":       rule.enabled,
+    }
+
+
+# — parsing —
+def parse_document(raw: bytes, fmt: Optional[str]) -> Tuple[str, List[dict]]:
+    """Decode an upload into ``(format, rule dicts)``; ``fmt=None`` sniffs it."""
+    text = raw.decode("utf-8-sig")
+    if fmt == "ndjson":
+        return fmt, _parse_ndjson(text)
+
+    try:
+        doc = json.loads(text)
+    except ValueError:
+        if fmt is None:
+            try:
+                return "ndjson", _parse_ndjson(text)
+            except DocumentError:
+                pass
+        if fmt not in (None, "openapi"):
+            raise DocumentError("Invalid JSON document")
+        doc = _load_yaml(text)
+        fmt = "openapi"
+
+    if fmt is None:
+        if isinstance(doc, dict) and ("openapi" in doc or "swagger" in doc):
+            fmt = "openapi"
+        elif isinstance(doc, dict) and "log" in doc:
+            fmt = "har"
+        else:
+            fmt = "json"
+
+    if fmt == "openapi":
+        return fmt, from_openapi(doc)
+    if fmt == "har":
+        return fmt, from_har(doc)
+    if isinstance(doc, dict) and isinstance(doc.get("rules"), list):
+        doc = doc["rules"]
+    elif isinstance(doc, dict) and "path_regex" in doc:
+        doc = [doc]  # a one-line NDJSON file
+    if not isinstance(doc, list):
+        raise DocumentError("Expected a JSON array of rules")
+    return fmt, doc
+
+
+def _parse_ndjson(text: str) -> List[dict]:
+    rules = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            rules.append(json.loads(line))
+        except ValueError:
+            raise DocumentError(f"Invalid JSON on line {lineno}")
+    return rules
+
+
+def _load_yaml(text: str):
+    try:
+        import yaml
+    except ImportError:
+        raise DocumentError("Invalid JSON document (install PyYAML to import YAML OpenAPI files)")
+    try:
+        return yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        raise DocumentError(f"Invalid YAML document: {e}")
+
+
+# — OpenAPI / Swagger —
+def _openapi_path_regex(path: str) -> str:
+    parts = re.split(r"(\{[^}/]+\})", path)
+    return "".join("[^/]+" if p.startswith("{") else re.escape(p) for p in parts)
+
+
+def _resolve(doc: dict, node, depth: int = 0):
+    if isinstance(node, dict) and "$ref" in node and depth < 20:
+        target = doc
+        for key in node["$ref"].lstrip("#/").split("/"):
+            if not isinstance(target, dict):
+                return {}
+            target = target.get(key.replace("~1", "/").replace("~0", "~"), {})
+        return _resolve(doc, target, depth + 1)
+    return node
+
+
+def _example_from_schema(doc: dict, schema, depth: int = 0):
+    schema = _resolve(doc, schema)
+    if not isinstance(schema, dict) or depth > 8:
+        return None
+    if "example" in schema:
+        return schema["example"]
+    if "default" in schema:
+        return schema["default"]
+    if schema.get("enum"):
+        return schema["enum"][0]
+    for key in ("allOf", "oneOf", "anyOf"):
+        if schema.get(key):
+            if key == "allOf":
+                merged = {}
+                for sub in schema[key]:
+                    value = _example_from_schema(doc, sub, depth + 1)
+                    if isinstance(value, dict):
+                        merged.update(value)
+                return merged
+            return _example_from_schema(doc, schema[key][0], depth + 1)
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        return {name: _example_from_schema(doc, sub, depth + 1)
+                for name, sub in (schema.get("properties") or {}).items()}
+    if kind == "array":
+        item = _example_from_schema(doc, schema.get("items", {}), depth + 1)
+        return [item] if item is not None else []
+    return {"string": "string", "integer": 0, "number": 0, "boolean": True}.get(kind)
+
+
+def _openapi_response(doc: dict, responses: dict) -> Tuple[int, dict, str]:
+    codes = sorted(c for c in responses if str(c).isdigit() and str(c).startswith("2"))
+    code = codes[0] if codes else ("default" if "default" in responses else None)
+    if code is None:
+        return 200, {}, ""
+    resp = _resolve(doc, responses[code]) or {}
+    status = int(code) if str(code).isdigit() else 200
+
+    example, mime = None, None
+    content = resp.get("content")
+    if isinstance(content, dict) and content:
+        # OpenAPI 3: prefer JSON, then whatever comes first
+        mime = next((m for m in content if "json" in m), next(iter(content)))
+        media = _resolve(doc, content[mime]) or {}
+        if "example" in media:
+            example = media["example"]
+        elif media.get("examples"):
+            first = _resolve(doc, next(iter(media["examples"].values())))
+            example = first.get("value") if isinstance(first, dict) else None
+        else:
+            example = _example_from_schema(doc, media.get("schema"))
+    elif isinstance(resp.get("examples"), dict) and resp["examples"]:
+        # Swagger 2
+        mime, example = next(iter(resp["examples"].items()))
+    elif "schema" in resp:
+        mime, example = "application/json", _example_from_schema(doc, resp["schema"])
+
+    headers = {"Content-Type": mime} if mime else {}
+    if example is None:
+        return status, headers, ""
+    if isinstance(example, str) and not (mime and "json" in mime):
+        return status, headers, example
+    return status, headers, json.dumps(example, indent=2, ensure_ascii=False)
+
+
+def from_openapi(doc) -> List[dict]:
+    if not isinstance(doc, dict) or not isinstance(doc.get("paths"), dict):
+        raise DocumentError("OpenAPI document has no paths")
+    rules = []
+    for path, item in doc["paths"].items():
+        item = _resolve(doc, item)
+        if not isinstance(item, dict):
+            continue
+        for method, op in item.items():
+            if method.upper() not in METHODS or not isinstance(op, dict):
+                continue
+            status, headers, template = _openapi_response(doc, op.get("responses") or {})
+            rules.append({
+                "method":        method.upper(),
+                "path_regex":    _openapi_path_regex(path),
+                "status_code":   status,
+                "headers":       headers,
+                "body_template": {"template": template},
+            })
+    return rules
+
+
+# — HAR —
+def from_har(doc) -> List[dict]:
+    entries = doc.get("log", {}).get("entries") if isinstance(doc, dict) else None
+    if not isinstance(entries, list):
+        raise DocumentError("HAR document has no log.entries")
+    rules = []
+    for entry in entries:
+        req  = entry.get("request") or {}
+        resp = entry.get("response") or {}
+        path = urlsplit(req.get("url", "")).path or "/"
+
+        request_body = None
+        post_text = (req.get("postData") or {}).get("text")
+        if post_text:
+            try:
+                parsed = json.loads(post_text)
+            except ValueError:
+                parsed = None
+            request_body = parsed if isinstance(parsed, dict) else post_text
+
+        content = resp.get("content") or {}
+        body = content.get("text") or ""
+        if body and content.get("encoding") == "base64":
+            try:
+                body = base64.b64decode(body).decode("utf-8")
+            except (ValueError, UnicodeDecodeError):
+                body = ""  # binary bodies can't be served from a text template
+
+        headers = {}
+        for h in resp.get("headers") or []:
+            name = h.get("name", "")
+            if name and not name.startswith(":") and name.lower() not in _HAR_SKIP_HEADERS:
+                headers[name] = h.get("value", "")
+
+        rules.append({
+            "method":        (req.get("method") or "GET").upper(),
+            "path_regex":    re.escape(path),
+            "request_body":  request_body,
+            "status_code":   resp.get("status") or 200,
+            "headers":       headers,
+            "body_template": {"template": body},
+        })
+    return rules
+
+
+def strip_base_path(rules: List[dict], base_path: str) -> None:
+    """Make imported paths relative to the project, e.g. drop ``/api/v1``."""
+    prefix = re.escape(base_path.rstrip("/"))
+    for r in rules:
+        p = r.get("path_regex")
+        if isinstance(p, str) and p.startswith(prefix):
+            r["path_regex"] = p[len(prefix):] or "/"
+
+
+# — validation —
+def _int(value, field: str, minimum: int = 0, maximum: Optional[int] = None) -> int:
+    if isinstance(value, bool):
+        raise ValueError(f"{field} must be an integer")
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be an integer")
+    if number < minimum:
+        raise ValueError(f"{field} must be >= {minimum}")
+    if maximum is not None and number > maximum:
+        raise ValueError(f"{field} must be <= {maximum}")
+    return number
+
+
+def normalize_rule(raw, project_id: int) -> dict:
+    """Validate one rule and return the row to insert; raises ValueError."""
+    if not isinstance(raw, dict):
+        raise ValueError("Rule must be an object")
+
+    method = str(raw.get("method") or "").upper()
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+
+    path_regex = raw.get("path_regex")
+    if not isinstance(path_regex, str) or not path_regex:
+        raise ValueError("path_regex is required")
+    try:
+        re.compile(path_regex)
+    except re.error as e:
+        raise ValueError(f"Invalid path_regex: {e}")
+
+    request_body = raw.get("request_body")
+    if request_body is not None and not isinstance(request_body, (dict, str)):
+        raise ValueError("request_body must be a JSON object or a string")
+
+    bt = raw.get("body_template")
+    if isinstance(bt, str) and raw.get("response_type") == "weighted":
+        try:
+            bt = json.loads(bt)
+        except ValueError:
+            raise ValueError("Invalid JSON for weighted responses")
+    weighted = raw.get("response_type") == "weighted" or isinstance(bt, list)
+
+    row = {
+        "project_id":   project_id,
+        "method":       method,
+        "path_regex":   path_regex,
+        "request_body": request_body,
+        "request_body_hash": request_body_hash(request_body),
+        "latency":      parse_latency(raw.get("latency")),
+        "enabled":      bool(raw.get("enabled", True)),
+    }
+
+    if weighted:
+        if not isinstance(bt, list) or not bt:
+            raise ValueError("body_template must be a non-empty array for weighted responses")
+        total = 0
+        for e in bt:
+            if not isinstance(e, dict):
+                raise ValueError("Each weighted entry must be an object")
+            if e.get("weight") is None:
+                raise ValueError("Each weighted entry requires a weight")
+            total += _int(e["weight"], "weight")
+            if not isinstance(e.get("template", ""), str):
+                raise ValueError("template must be a string")
+            if "status_code" in e:
+                _int(e["status_code"], "status_code", 100, 599)
+            if not isinstance(e.get("headers", {}), dict):
+                raise ValueError("headers must be an object")
+            if "latency" in e:
+                e["latency"] = parse_latency(e["latency"])
+        if total != 100:
+            raise ValueError(f"Total weight must equal 100% (got {total}%)")
+        row.update(body_template=bt, delay=0, delay_ms=0, status_code=200, headers={})
+        return row
+
+    template = bt.get("template", "") if isinstance(bt, dict) else (bt or "")
+    if not isinstance(template, str):
+        raise ValueError("template must be a string")
+    headers = raw.get("headers") or {}
+    if not isinstance(headers, dict):
+        raise ValueError("headers must be an object")
+    status_code = _int(raw.get("status_code", 200), "status_code", 100, 599)
+    delay       = _int(raw.get("delay", 0) or 0, "delay")
+    delay_ms    = _int(raw.get("delay_ms", 0) or 0, "delay_ms")
+    row.update(
+        status_code=status_code,
+        headers=headers,
+        delay=delay,
+        delay_ms=delay_ms,
+        body_template={
+            "delay":       delay,
+            "delay_ms":    delay_ms,
+            "status_code": status_code,
+            "headers":     headers,
+            "template":    template,
+        },
+    )
+    return row
+
+
+def rule_key(method: str, path_regex: str, body_hash: Optional[str]) -> tuple:
+    """What makes two rules duplicates: method + path + request body."""
+    return method.upper(), path_regex, body_hash
@@ -0,0 +1,30 @@
+from sqlalchemy import inspect, text
+from .db import db
+
+
+def upgrade_schema():
+    """Add columns and indexes that the models gained since the tables were created.
+
+    ``db.create_all()`` only creates missing tables, so existing databases
+    would never pick up new columns. New columns are added as nullable and
+    the code treats NULL as the column's default.
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                ddl = (f'ALTER TABLE {table.name} ADD COLUMN "{col.name}" '
+                       f'{col.type.compile(dialect=engine.dialect)}')
+                for fk in col.foreign_keys:
+                    ddl += f" REFERENCES {fk.column.table.name} ({fk.column.name})"
+                    if fk.ondelete:
+                        ddl += f" ON DELETE {fk.ondelete}"
+                conn.execute(text(ddl))
+            for idx in table.indexes:
+                idx.create(conn, checkfirst=True)
@@ -11,6 +11,11 @@ document.addEventListener("DOMContentLoaded", () => {
   const logsPerPage = 20;
   let totalLogs = 0;
   let cachedLogs = [];
+  // before_id cursor for each page; page 1 has none
+  let pageCursors = [null];
+  let latestId = null;
+  // after_id for the next poll; trails latestId so late commits are not missed
+  let pollAfterId = null;
 
   function getStatusColorClass(status) {
     if (typeof status !== "number") return "bg-secondary";
@@ -38,16 +43,7 @@ document.addEventListener("DOMContentLoaded", () => {
           </td>
         </tr>
         <tr id="details-${log.id}" style="display:none;">
-          <td colspan="7">
-            <strong>Headers:</strong>
-            <pre>${JSON.stringify(log.headers, null, 2)}</pre>
-            <strong>Query:</strong>
-            <pre>${JSON.stringify(log.query, null, 2)}</pre>
-            <strong>Body:</strong>
-            <pre>${JSON.stringify(log.body, null, 2)}</pre>
-            <strong>Response:</strong>
-            <pre>${JSON.stringify(log.response?.body ?? {}, null, 2)}</pre>
-          </td>
+          <td colspan="7"><em>Loading…</em></td>
         </tr>
       `;
     }).join("");
@@ -55,24 +51,60 @@ document.addEventListener("DOMContentLoaded", () => {
 
   async function fetchLogs() {
     try {
-      const res = await fetch(`/api/logs?page=${currentPage}&limit=${logsPerPage}&_=${Date.now()}`);
+      const cursor = pageCursors[currentPage - 1];
+      const params = new URLSearchParams({ limit: logsPerPage, total: "estimate" });
+      if (cursor !== null) params.set("before_id", cursor);
+      const res = await fetch(`/api/logs?${params}`, { cache: "no-store" });
       const { logs, total } = await res.json();
       cachedLogs = logs;
       totalLogs = total;
-      if (liveMode) {
-        renderLogs(cachedLogs);
-        updatePaginationDisplay();
-      }
+      if (currentPage === 1) latestId = logs.length ? logs[0].id : latestId;
+      renderLogs(cachedLogs);
+      updatePaginationDisplay();
+    } catch (err) {
+      console.error("Failed to fetch logs:", err);
+    }
+  }
+
+  // Rows can arrive out of id order (another worker committed late), and a
+  // poll can return rows already shown: merge by id.
+  function prependLogs(logs) {
+    const shown = new Set(cachedLogs.map(log => log.id));
+    const fresh = logs.filter(log => !shown.has(log.id));
+    if (!fresh.length) return;
+    totalLogs += fresh.length;
+    cachedLogs = [...fresh, ...cachedLogs]
+      .sort((a, b) => b.id - a.id)
+      .slice(0, logsPerPage);
+    latestId = Math.max(latestId ?? 0, cachedLogs[0].id);
+    renderLogs(cachedLogs);
+    updatePaginationDisplay();
+  }
+
+  // Fallback when EventSource is unavailable: only ask for rows newer than
+  // the newest one on screen.
+  async function pollNewLogs() {
+    if (currentPage !== 1) return;
+    if (latestId === null) return fetchLogs();
+    try {
+      const params = new URLSearchParams({ limit: logsPerPage, after_id: pollAfterId ?? latestId });
+      const res = await fetch(`/api/logs?${params}`, { cache: "no-store" });
+      const { logs, poll_after_id, next_after_id } = await res.json();
+      pollAfterId = poll_after_id;
+      if (!logs.length) return;
+      // more new rows than fit on the page: only the newest are shown anyway
+      if (next_after_id !== null) return fetchLogs();
+      prependLogs(logs);
     } catch (err) {
       console.error("Failed to fetch logs:", err);
     }
   }
 
   function updatePaginationDisplay() {
-    const totalPages = Math.ceil(totalLogs / logsPerPage);
-    paginationInfo.textContent = `Page ${currentPage} of ${totalPages}`;
+    const totalPages = Math.max(1, Math.ceil(totalLogs / logsPerPage));
+    paginationInfo.textContent = `Page ${currentPage} of ~${totalPages}`;
     prevBtn.disabled = currentPage <= 1;
-    nextBtn.disabled = currentPage >= totalPages;
+    nextBtn.disabled = cachedLogs.length < logsPerPage;
   }
 
   clearBtn.addEventListener("click", async () => {
@@ -80,6 +112,10 @@ document.addEventListener("DOMContentLoaded", () => {
     const res = await fetch("/api/logs", { method: "DELETE" });
     if (res.ok) {
       currentPage = 1;
+      pageCursors = [null];
+      latestId = null;
+      pollAfterId = null;
+      totalLogs = 0;
       cachedLogs = [];
       renderLogs([]);
       updatePaginationDisplay();
@@ -102,18 +138,71 @@ document.addEventListener("DOMContentLoaded", () => {
   });
 
   nextBtn.addEventListener("click", () => {
+    if (!cachedLogs.length) return;
+    pageCursors[currentPage] = cachedLogs[cachedLogs.length - 1].id;
     currentPage++;
     fetchLogs();
   });
 
-  setInterval(() => {
-    if (liveMode) fetchLogs();
-  }, 3000);
+  function startPolling() {
+    setInterval(() => {
+      if (liveMode) pollNewLogs();
+    }, 3000);
+  }
+
+  // Live mode: the server pushes each new log over SSE.
+  if (window.EventSource) {
+    const stream = new EventSource("/api/logs/stream");
+    // refused (503: the worker has too many viewers) rather than dropped
+    stream.addEventListener("error", () => {
+      if (stream.readyState === EventSource.CLOSED) startPolling();
+    });
+    // (re)connected: resync in case rows were written while disconnected
+    stream.addEventListener("open", () => {
+      if (liveMode && currentPage === 1) fetchLogs();
+    });
+    stream.addEventListener("log", e => {
+      if (!liveMode || currentPage !== 1) return;
+      const log = JSON.parse(e.data);
+      prependLogs([log]);
+    });
+    stream.addEventListener("lagged", () => {
+      if (liveMode && currentPage === 1) fetchLogs();
+    });
+  } else {
+    startPolling();
+  }
   fetchLogs();
 });
 
-function toggleDetails(id) {
+// List rows only carry metadata; bodies are fetched the first time a row
+// is expanded.
+async function toggleDetails(id) {
   const row = document.getElementById("details-" + id);
   if (!row) return;
   row.style.display = row.style.display === "none" ? "table-row" : "none";
+  if (row.dataset.loaded) return;
+  row.dataset.loaded = "1";
+  const cell = row.firstElementChild;
+  try {
+    const res = await fetch(`/api/logs/${id}`);
+    if (!res.ok) throw new Error(res.statusText);
+    const log = await res.json();
+    const esc = value => JSON.stringify(value, null, 2)
+      .replace(/&/g, "&amp;").replace(/</g, "&lt;");
+    cell.innerHTML = `
+      ${log.truncated ? `<span class="badge bg-secondary mb-2">Bodies truncated (request ${log.request_size} B, response ${log.response_size} B)</span>` : ""}
+      <strong>Headers:</strong>
+      <pre>${esc(log.headers)}</pre>
+      <strong>Query:</strong>
+      <pre>${esc(log.query)}</pre>
+      <strong>Body:</strong>
+      <pre>${esc(log.body)}</pre>
+      <strong>Response:</strong>
+      <pre>${esc(log.response?.body ?? {})}</pre>
+    `;
+  } catch (err) {
+    delete row.dataset.loaded;
+    cell.innerHTML = `<em>Failed to load details: ${err.message}</em>`;
+  }
 }
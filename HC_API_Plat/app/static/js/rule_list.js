@@ -137,8 +137,14 @@
     });
 
     // — Load & render —
+    // the list carries an ETag, so an unchanged list comes back as a 304
+    // from the browser cache
     async function loadRules(highlightId) {
-      rules = await fetchJSON(API_BASE);
+      rules = await fetchJSON(API_BASE, { cache: "no-cache" });
+      renderRules(highlightId);
+    }
+
+    function renderRules(highlightId) {
       tbody.innerHTML = rules.map(r => `
         <tr class="rule-row" data-id="${r.id}" data-path="${r.path_regex}">
           <td>${r.id}</td>
@@ -204,12 +210,16 @@
 
       if (btn.matches(".delete-rule")) {
         if (!confirm(`Delete rule ${id}?`)) return;
-        await fetch(`${API_BASE}/${id}`, { method:"DELETE" });
-        return loadRules();
+        const res = await fetch(`${API_BASE}/${id}`, { method:"DELETE" });
+        if (!res.ok) return loadRules();
+        rules = rules.filter(x => String(x.id) !== id);
+        return renderRules();
       }
       if (btn.matches(".toggle-rule")) {
-        await fetchJSON(`${API_BASE}/${id}/toggle`, { method:"POST" });
-        return loadRules(id);
+        const { enabled } = await fetchJSON(`${API_BASE}/${id}/toggle`, { method:"POST" });
+        const r = rules.find(x => String(x.id) === id);
+        if (r) r.enabled = enabled;
+        return renderRules(id);
       }
       if (btn.matches(".copy-rule")) {
           const r  = rules.find(x => String(x.id) === id);
@@ -1,8 +1,98 @@
+import hashlib
+import threading
+from collections import OrderedDict
 from pybars import Compiler
 
 compiler = Compiler()
 
+DEFAULT_CACHE_SIZE = 512
+
+
+class TemplateCache:
+    """Bounded LRU of compiled templates keyed by a hash of the template source."""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize   = maxsize
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+        self._entries  = OrderedDict()
+        self._lock     = threading.Lock()
+
+    @staticmethod
+    def key(template_str: str) -> str:
+        return hashlib.sha1(template_str.encode("utf-8")).hexdigest()
+
+    def get(self, template_str: str):
+        key = self.key(template_str)
+        with self._lock:
+            tmpl = self._entries.get(key)
+            if tmpl is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return tmpl
+            self.misses += 1
+
+        # compile outside the lock; a concurrent miss on the same key just
+        # compiles twice and the last writer wins
+        tmpl = compiler.compile(template_str)
+        if self.maxsize <= 0:
+            return tmpl
+        with self._lock:
+            self._entries[key] = tmpl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return tmpl
+
+    def evict(self, template_str: str) -> bool:
+        with self._lock:
+            if self._entries.pop(self.key(template_str), None) is None:
+                return False
+            self.evictions += 1
+            return True
+
+    def resize(self, maxsize: int) -> None:
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > max(maxsize, 0):
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size":      len(self._entries),
+                "maxsize":   self.maxsize,
+                "hits":      self.hits,
+                "misses":    self.misses,
+                "evictions": self.evictions,
+            }
+
+
+template_cache = TemplateCache()
+
+
+def template_strings(body_template) -> list:
+    """All template sources referenced by a rule's body_template."""
+    if isinstance(body_template, list):
+        return [e.get("template", "") for e in body_template if isinstance(e, dict)]
+    if isinstance(body_template, dict):
+        return [body_template.get("template", "")]
+    return []
+
+
+def evict_templates(body_template) -> None:
+    for tpl_str in template_strings(body_template):
+        template_cache.evict(tpl_str)
+
+
 def render_handlebars(template_str: str, context: dict) -> str:
-    tmpl = compiler.compile(template_str)
+    tmpl = template_cache.get(template_str)
     result = tmpl(context)
-    return result.decode() if isinstance(result, (bytes, bytearray)) else result
\ No newline at end of file
+    return result.decode() if isinstance(result, (bytes, bytearray)) else result
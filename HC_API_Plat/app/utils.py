@@ -1,4 +1,6 @@
-import re
+import re, json, hashlib
+from typing import Optional
+from datetime import datetime, timedelta
 
 def normalize_project_name(name: str) -> str:
     s = name.strip().lower()
@@ -6,3 +8,24 @@ def normalize_project_name(name: str) -> str:
     s = re.sub(r'_+', '_', s)               # collapse multiple underscores
     s = re.sub(r'[^a-z0-9_.,]', '', s)      # allow only a–z, 0–9, _, . and ,
     return s.rstrip('_. ,')                 # remove trailing underscores, dots, commas
+
+
+def vietnam_now() -> datetime:
+    # naive UTC+7, matching the timestamps stored by the models
+    return datetime.utcnow() + timedelta(hours=7)
+
+
+def request_body_hash(body) -> Optional[str]:
+    """Canonical hash of a rule's (or request's) body, for O(1) rule lookup.
+
+    JSON objects hash their key-sorted compact form, text hashes its stripped
+    form; anything else has no hash.
+    """
+    if isinstance(body, dict):
+        payload = "j:" + json.dumps(body, sort_keys=True, separators=(",", ":"),
+                                    ensure_ascii=False)
+    elif isinstance(body, str):
+        payload = "t:" + body.strip()
+    else:
+        return None
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,6 @@
+from app.asgi import create_asgi_app
+
+# Async serving mode: delayed mock responses are awaited on the event loop
+# instead of holding a worker thread.
+#   uvicorn asgi:app --host 0.0.0.0 --port 5000
+app = create_asgi_app()
@@ -0,0 +1,244 @@
+"""Mock hot-path benchmarks.
+
+Seeds synthetic projects with 1, 100 and 10k rules (single and weighted
+templates) and times find_matching_rule, render_handlebars, log_request and
+end-to-end dynamic_mock through the Flask test client. Results (p50/p95/p99
+latency and throughput) are written as JSON so runs can be compared across
+commits with ``compare.py``.
+
+    python benchmarks/bench.py                          # SQLite stand-in
+    python benchmarks/bench.py --database-url postgresql://user:pw@localhost/hc_bench
+    python benchmarks/bench.py --rules 1,100 --iterations 500 -o before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    p.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"),
+                   help="defaults to a temporary SQLite file")
+    p.add_argument("--rules", default="1,100,10000",
+                   help="comma-separated rule counts per project")
+    p.add_argument("--iterations", type=int, default=1000)
+    p.add_argument("--warmup", type=int, default=50)
+    p.add_argument("-o", "--output", default=None,
+                   help="JSON output path (default: benchmarks/results/<commit>.json)")
+    return p.parse_args()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def setup_app(database_url):
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("JWT_SECRET_KEY", "bench")
+    os.environ.setdefault("LOG_RETENTION_ENABLED", "0")
+
+    if database_url.startswith("sqlite"):
+        # SQLite has no JSONB; store it as JSON so the models can be created
+        from sqlalchemy.ext.compiler import compiles
+        from sqlalchemy.dialects.postgresql import JSONB
+
+        @compiles(JSONB, "sqlite")
+        def _jsonb_sqlite(type_, compiler, **kw):
+            return "JSON"
+
+    from app import create_app
+    return create_app()
+
+
+SINGLE_TEMPLATE = '{"id": "{{query.id}}", "path": "{{path}}", "items": [1, 2, 3]}'
+WEIGHTED_TEMPLATE = [
+    {"weight": 70, "status_code": 200, "headers": {}, "template": '{"ok": true, "id": "{{query.id}}"}'},
+    {"weight": 30, "status_code": 500, "headers": {}, "template": '{"ok": false}'},
+]
+
+
+def seed(n_rules, weighted, pattern=r"/r{i}/\d+", kind=None):
+    from app.db import db
+    from app.models import MockRule
+    from app.crud import create_project
+    from app import rule_index
+
+    kind = kind or ("weighted" if weighted else "single")
+    project = create_project({"name": f"bench_{kind}_{n_rules}"})
+    rules = []
+    for i in range(n_rules):
+        if weighted:
+            body_template = WEIGHTED_TEMPLATE
+        else:
+            body_template = {"template": SINGLE_TEMPLATE}
+        rules.append(MockRule(
+            project_id=project.id,
+            method="GET",
+            path_regex=pattern.format(i=i),
+            headers={"Content-Type": "application/json"},
+            body_template=body_template,
+            status_code=200,
+        ))
+    db.session.add_all(rules)
+    db.session.commit()
+    rule_index.invalidate(project.id)
+    return project
+
+
+def scan(rules, path, body_hashes):
+    """First-match scan over the candidates, as rules were matched before the
+    dispatcher; the baseline for the rule_dispatch benchmarks."""
+    for r in rules.candidates(body_hashes):
+        if r.pattern.fullmatch(path):
+            return r
+    return None
+
+
+def measure(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter_ns()
+        fn()
+        samples.append(time.perf_counter_ns() - t0)
+    elapsed = time.perf_counter() - start
+    samples.sort()
+
+    def pct(p):
+        return samples[min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))] / 1000.0
+
+    return {
+        "n":         iterations,
+        "mean_us":   round(sum(samples) / len(samples) / 1000.0, 2),
+        "p50_us":    round(pct(50), 2),
+        "p95_us":    round(pct(95), 2),
+        "p99_us":    round(pct(99), 2),
+        "ops_per_s": round(iterations / elapsed, 1),
+    }
+
+
+def run(app, rule_counts, iterations, warmup):
+    from app.crud import find_matching_rule, log_request, write_logs
+    from app.template_engine import render_handlebars
+    from app.log_writer import log_writer
+    from app.utils import request_body_hash
+    from app import rule_index
+
+    client = app.test_client()
+    results = []
+
+    def record(name, n_rules, template, stats):
+        row = {"name": name, "rules": n_rules, "template": template, **stats}
+        results.append(row)
+        print(f"{name:<24} rules={n_rules:<6} {template:<8} "
+              f"p50={row['p50_us']:>9.1f}us p95={row['p95_us']:>9.1f}us "
+              f"p99={row['p99_us']:>9.1f}us {row['ops_per_s']:>9.1f} ops/s")
+
+    def record_dispatch(suffix, project_id, path, n_rules):
+        with app.app_context():
+            rules = rule_index.rules_for(project_id, "GET")
+        hashes = [request_body_hash("")]
+        record("rule_dispatch" + suffix, n_rules, "single", measure(
+            lambda: rules.match(path, hashes), iterations, warmup))
+        record("rule_scan" + suffix, n_rules, "single", measure(
+            lambda: scan(rules, path, hashes), iterations, warmup))
+
+    context = {"query": {"id": "42"}, "path": "/r0/1", "body": {}, "headers": {},
+               "method": "GET", "raw_body": ""}
+    record("render_handlebars", 0, "single",
+           measure(lambda: render_handlebars(SINGLE_TEMPLATE, context), iterations, warmup))
+
+    log_record = {"project_id": None, "method": "GET", "path": "/r0/1",
+                  "headers": {"Content-Type": "application/json"}, "query": {"id": "42"},
+                  "body": "", "matched_rule_id": None, "status_code": 200,
+                  "response_body": SINGLE_TEMPLATE}
+    with app.app_context():
+        record("log_request.enqueue", 0, "-",
+               measure(lambda: log_request(log_record), iterations, warmup))
+        log_writer.flush(timeout=60)
+        record("log_request.sync", 0, "-",
+               measure(lambda: write_logs([log_record]), max(1, iterations // 10), warmup // 10))
+
+    for n_rules in rule_counts:
+        for weighted in (False, True):
+            template = "weighted" if weighted else "single"
+            with app.app_context():
+                project = seed(n_rules, weighted)
+                project_id, project_name = project.id, project.name
+            # worst case for a first-match scan: the last rule matches
+            last = n_rules - 1
+            path = f"/r{last}/7"
+
+            if not weighted:
+                with app.test_request_context(path, method="GET"):
+                    record("find_matching_rule", n_rules, template, measure(
+                        lambda: find_matching_rule("GET", path, project_id),
+                        iterations, warmup))
+                    record("find_matching_rule.miss", n_rules, template, measure(
+                        lambda: find_matching_rule("GET", "/nope", project_id),
+                        iterations, warmup))
+                record_dispatch("", project_id, path, n_rules)
+                # no literal prefix: every rule lands in the combined regex
+                with app.app_context():
+                    regex_id = seed(n_rules, False, pattern=r"/(?:v1|v2)/r{i}/\d+",
+                                    kind="regex").id
+                record_dispatch(".regex", regex_id, f"/v2/r{last}/7", n_rules)
+
+            url = f"/{project_name}{path}?id=42"
+            record("dynamic_mock", n_rules, template, measure(
+                lambda: client.get(url), iterations, warmup))
+            log_writer.flush(timeout=60)
+
+    return results
+
+
+def main():
+    args = parse_args()
+    tmpdir = None
+    database_url = args.database_url
+    if not database_url:
+        tmpdir = tempfile.mkdtemp(prefix="hc_bench_")
+        database_url = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    app = setup_app(database_url)
+    rule_counts = [int(n) for n in args.rules.split(",") if n]
+    commit = git_commit()
+
+    results = run(app, rule_counts, args.iterations, args.warmup)
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "meta": {
+                "commit":     commit,
+                "timestamp":  datetime.utcnow().isoformat() + "Z",
+                "python":     platform.python_version(),
+                "platform":   platform.platform(),
+                "database":   database_url.split("://", 1)[0],
+                "iterations": args.iterations,
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"\nwrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Compare two bench.py result files.
+
+    python benchmarks/compare.py benchmarks/results/abc123.json benchmarks/results/def456.json
+"""
+import argparse
+import json
+
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    rows = {(r["name"], r["rules"], r["template"]): r for r in data["results"]}
+    return data["meta"], rows
+
+
+def main():
+    p = argparse.ArgumentParser(description="Compare two benchmark runs")
+    p.add_argument("base")
+    p.add_argument("head")
+    p.add_argument("--metric", default="p95_us",
+                   choices=["mean_us", "p50_us", "p95_us", "p99_us", "ops_per_s"])
+    args = p.parse_args()
+
+    base_meta, base = load(args.base)
+    head_meta, head = load(args.head)
+    print(f"{args.metric}: {base_meta['commit']} -> {head_meta['commit']}\n")
+    print(f"{'benchmark':<24} {'rules':>6} {'template':<9} {'base':>11} {'head':>11} {'change':>8}")
+    for key in sorted(set(base) | set(head), key=lambda k: (k[0], k[1], k[2])):
+        b = base.get(key, {}).get(args.metric)
+        h = head.get(key, {}).get(args.metric)
+        if b and h:
+            change = f"{(h - b) / b * 100:+.1f}%"
+        else:
+            change = "n/a"
+        fmt = lambda v: f"{v:>11.1f}" if v is not None else f"{'-':>11}"
+        print(f"{key[0]:<24} {key[1]:>6} {key[2]:<9} {fmt(b)} {fmt(h)} {change:>8}")
+
+
+if __name__ == "__main__":
+    main()
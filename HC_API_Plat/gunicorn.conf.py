@@ -0,0 +1,52 @@
+# Production server config:
+#   gunicorn -c gunicorn.conf.py run:app
+# or, with awaited mock delays (see asgi.py):
+#   WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:app
+import os
+import multiprocessing
+
+bind             = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers          = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads          = int(os.environ.get("GUNICORN_THREADS", 8))
+worker_class     = os.environ.get("WORKER_CLASS", "gthread")
+keepalive        = int(os.environ.get("KEEPALIVE", 5))
+# must exceed the longest configured mock delay
+timeout          = int(os.environ.get("TIMEOUT", 120))
+# SIGTERM lets workers finish in-flight mock requests for this long
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+max_requests     = int(os.environ.get("MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", 0))
+
+# run create_app() (and db.create_all()) once in the master, then fork
+preload_app      = True
+
+accesslog        = os.environ.get("ACCESS_LOG") or None
+errorlog         = "-"
+
+
+def _flask_app(server):
+    from flask import Flask
+    app = server.app.wsgi()
+    return app if isinstance(app, Flask) else app.wsgi_app
+
+
+def post_fork(server, worker):
+    # connections opened by the master during create_app() must not be
+    # shared between workers
+    from app.db import db
+    from app.retention import log_retention
+    with _flask_app(server).app_context():
+        db.engine.dispose(close=False)
+    # every worker schedules passes; one at a time holds the runner lock
+    log_retention.start()
+
+
+def worker_exit(server, worker):
+    from app.log_writer import log_writer
+    log_writer.stop()
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,187 @@
+import re
+import random
+from types import SimpleNamespace
+import pytest
+from flask import Flask
+from app import crud, rule_index
+from app.dispatch import Dispatcher, literal_prefix
+from app.rule_index import MethodRules, compile_rules
+from app.utils import request_body_hash
+
+
+def make_rules(regexes):
+    return [SimpleNamespace(path_regex=rx, pattern=re.compile(rx), position=i)
+            for i, rx in enumerate(regexes)]
+
+
+def scan(rules, path):
+    """The reference: first rule in creation order whose regex fully matches."""
+    for r in rules:
+        if r.pattern.fullmatch(path):
+            return r
+    return None
+
+
+def assert_same(regexes, paths):
+    rules = make_rules(regexes)
+    dispatcher = Dispatcher(rules)
+    for path in paths:
+        expected, got = scan(rules, path), dispatcher.match(path)
+        assert got is expected, (
+            f"{path!r}: dispatcher picked "
+            f"{got and got.path_regex!r}, scan {expected and expected.path_regex!r}")
+
+
+# — literal_prefix —
+@pytest.mark.parametrize("regex, expected", [
+    ("/health",          ("/health", True)),
+    ("^/health$",        ("/health", True)),
+    ("/v1/users/\\d+",   ("/v1/users/", False)),
+    ("/v1/users?",       ("/v1/user", False)),
+    ("/a+/b",            ("/", False)),
+    ("/a{2}",            ("/", False)),
+    ("/a\\.json",        ("/a.json", True)),
+    ("/a|/b",            ("", False)),
+    ("(/a|/b)/c",        ("", False)),
+    ("/x/(?P<id>\\d+)",  ("/x/", False)),
+    ("\\A/x",            ("", False)),
+])
+def test_literal_prefix(regex, expected):
+    assert literal_prefix(regex) == expected
+
+
+# — Dispatcher vs first-match scan —
+PATHS = [
+    "", "/", "/health", "/health/", "/healthz", "/v1", "/v1/", "/v1/users",
+    "/v1/users/", "/v1/users/42", "/v1/users/42/", "/v1/users/abc",
+    "/v1/users/42/orders", "/v1/user", "/v1/userss", "/a", "/aa", "/aaa", "/b",
+    "/a/b", "/aa/b", "/x/1", "/x/1/1", "/x/12/12", "/x/1/2", "/X/1", "/c/d/e",
+    "/a.json", "/aXjson", "/v2/items/7", "/v2/items/7/",
+]
+
+
+@pytest.mark.parametrize("name, regexes", [
+    ("literal and anchored", [
+        "/health", "^/health$", "/v1/users", "^/v1/users/42$", "/v1/users/.*",
+    ]),
+    ("quantified prefix characters", [
+        "/v1/users?", "/a+", "/a{2}", "/a*/b", "/v1/users/\\d+", "/x/\\d?/\\d",
+    ]),
+    ("top-level alternation", [
+        "/a|/b", "/health|/v1/users/\\d+", "(/a|/b)/b", "/c|/d/e|/c/d/e",
+    ]),
+    ("named and capturing groups", [
+        "/v1/users/(?P<id>\\d+)", "/v1/users/(\\d+)/(orders)?", "/x/(\\d)/(\\d)",
+        "/v2/(?:items)/(?P<n>\\d+)/?",
+    ]),
+    ("backreferences and inline flags", [
+        # after the first rule, \1 would compile but refer to its marker group
+        "/x/(\\d)/(\\d)", "/x/(\\d+)/\\1", "/x/(?P<a>\\d+)/(?P=a)", "(?i)/x/1", "/x/(?i:1)",
+        "/x/(a)?(?(1)b|\\d)", "/x/1/1",
+    ]),
+    ("trailing slashes", [
+        "/v1/users/", "/v1/users/?", "/health/", "/v1/users/\\d+/", "/v2/items/\\d+/?",
+    ]),
+    ("dots", ["/a.json", "/a\\.json", "/a.*", ".*"]),
+    ("catch-all first", [".*", "/health", "/v1/users/\\d+"]),
+    ("catch-all last", ["/health", "/v1/users/\\d+", "/.*"]),
+])
+def test_matches_scan(name, regexes):
+    assert_same(regexes, PATHS)
+    # creation order decides, so the reversed list must agree with its own scan
+    assert_same(list(reversed(regexes)), PATHS)
+
+
+def test_same_rule_twice_picks_the_first():
+    rules = make_rules(["/v1/users/\\d+", "/v1/users/\\d+", "/health", "/health"])
+    dispatcher = Dispatcher(rules)
+    assert dispatcher.match("/v1/users/1") is rules[0]
+    assert dispatcher.match("/health") is rules[2]
+
+
+def test_many_rules_span_blocks(monkeypatch):
+    monkeypatch.setattr("app.dispatch.BLOCK_SIZE", 7)
+    regexes = [f"/r{i % 13}/(\\d+)" if i % 3 else f"(/r{i % 13}|/s)/\\w+" for i in range(60)]
+    paths = [f"/r{i}/{j}" for i in range(14) for j in ("1", "x")] + ["/s/1", "/s/"]
+    assert_same(regexes, paths)
+
+
+def test_random_rules_match_scan():
+    rng = random.Random(1234)
+    pieces = ["/v1", "/v2", "/users", "/items", "/\\d+", "/\\w+", "/(\\d+)",
+              "/(?P<x>[a-z]+)", "/?", "/.*", "/a|/b", "/(a|b)", "/x+", "/y?"]
+    segments = ["v1", "v2", "users", "items", "1", "42", "abc", "a", "b", "x", "xx", ""]
+    for _ in range(30):
+        regexes = []
+        for _ in range(rng.randint(1, 40)):
+            rx = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 4)))
+            try:
+                re.compile(rx)
+            except re.error:
+                continue
+            regexes.append(rx if rng.random() < 0.8 else f"^{rx}$")
+        paths = ["/" + "/".join(rng.choice(segments) for _ in range(rng.randint(0, 4)))
+                 for _ in range(60)]
+        assert_same(regexes, paths)
+
+
+# — body-hash collision fallback in find_matching_rule —
+def mock_rule(rule_id, path_regex, request_body=None, body_hash=None):
+    return SimpleNamespace(
+        id=rule_id, project_id=1, method="POST", path_regex=path_regex,
+        request_body=request_body, request_body_hash=body_hash, headers=None,
+        body_template={"template": str(rule_id)}, delay=None, delay_ms=None,
+        status_code=200, created_at=None, latency=None,
+    )
+
+
+@pytest.fixture
+def match_with(monkeypatch):
+    def run(rules, path, body):
+        index = compile_rules(rules)
+        monkeypatch.setattr(rule_index, "rules_for",
+                            lambda project_id, method: index.get(method, rule_index._EMPTY))
+        with Flask(__name__).test_request_context(path, method="POST", json=body):
+            r = crud.find_matching_rule("POST", path, 1)
+        return r.id if r is not None else None
+    return run
+
+
+def test_body_hash_collision_falls_back_to_scan(match_with):
+    # rule 1 claims the request body's hash but has a different body
+    colliding = request_body_hash({"a": 2})
+    rules = [
+        mock_rule(1, "/orders", {"a": 1}, body_hash=colliding),
+        mock_rule(2, "/orders", {"a": 2}),
+        mock_rule(3, "/orders"),
+    ]
+    assert match_with(rules, "/orders", {"a": 2}) == 2
+    assert match_with(rules, "/orders", {"a": 3}) == 3
+
+
+def test_body_hash_collision_without_real_match(match_with):
+    colliding = request_body_hash({"a": 2})
+    rules = [mock_rule(1, "/orders", {"a": 1}, body_hash=colliding)]
+    assert match_with(rules, "/orders", {"a": 2}) is None
+
+
+def test_earliest_of_body_and_any_body_rules(match_with):
+    rules = [
+        mock_rule(1, "/orders/\\d+"),
+        mock_rule(2, "/orders/1", {"a": 1}),
+        mock_rule(3, "/orders/(?P<id>\\d+)", {"a": 1}),
+    ]
+    assert match_with(rules, "/orders/1", {"a": 1}) == 1
+    rules.reverse()
+    assert match_with(rules, "/orders/1", {"a": 1}) == 3
+
+
+def test_method_rules_candidates_keep_creation_order():
+    rules = compile_rules([
+        mock_rule(1, "/a", {"a": 1}),
+        mock_rule(2, "/a"),
+        mock_rule(3, "/a", {"a": 1}),
+    ])["POST"]
+    assert isinstance(rules, MethodRules)
+    ids = [r.id for r in rules.candidates([request_body_hash({"a": 1})])]
+    assert ids == [1, 2, 3]
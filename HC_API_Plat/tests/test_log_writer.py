@@ -0,0 +1,85 @@
+import time
+import pytest
+from flask import Flask
+from app.log_writer import LogWriter, BLOCK, DROP_OLDEST
+
+
+@pytest.fixture
+def writer():
+    """A writer whose batches land in ``writer.out`` instead of the DB."""
+    w = LogWriter()
+    w.out = []
+
+    def write(batch):
+        w.out.append(list(batch))
+        w.written += len(batch)
+        w.batches += 1
+    w._write = write
+    yield w
+    w.stop()
+
+
+def records(n):
+    return [{"n": i} for i in range(n)]
+
+
+# — overflow policies —
+def test_drop_oldest_keeps_newest(writer, monkeypatch):
+    # no writer thread, so the queue only ever grows
+    monkeypatch.setattr(writer, "_ensure_started", lambda: None)
+    writer.max_queue, writer.overflow_policy = 3, DROP_OLDEST
+    results = [writer.enqueue(r) for r in records(5)]
+    assert results == [True, True, True, False, False]
+    assert list(writer._queue) == records(5)[2:]
+    assert writer.dropped == 2 and writer.enqueued == 5
+
+
+def test_block_loses_nothing(writer):
+    slow = writer._write
+
+    def write(batch):
+        time.sleep(0.005)
+        slow(batch)
+    writer._write = write
+    writer.max_queue, writer.batch_size, writer.overflow_policy = 2, 1, BLOCK
+    for r in records(20):
+        assert writer.enqueue(r)
+    assert writer.flush(5)
+    assert [r for batch in writer.out for r in batch] == records(20)
+    assert writer.dropped == 0 and writer.blocked > 0
+
+
+def test_stop_unblocks_a_full_queue(writer, monkeypatch):
+    monkeypatch.setattr(writer, "_ensure_started", lambda: None)
+    writer.max_queue, writer.overflow_policy = 1, BLOCK
+    writer._stopping = True
+    writer.enqueue({"n": 0})
+    # stopping falls back to dropping rather than waiting forever
+    assert writer.enqueue({"n": 1}) is False
+    assert list(writer._queue) == [{"n": 1}]
+
+
+# — batching —
+def test_batches_respect_batch_size(writer):
+    writer.batch_size, writer.flush_interval_ms = 3, 50
+    for r in records(7):
+        writer.enqueue(r)
+    assert writer.flush(5)
+    assert all(len(batch) <= 3 for batch in writer.out)
+    assert [r for batch in writer.out for r in batch] == records(7)
+    assert writer.stats()["written"] == 7
+
+
+def test_stop_flushes_the_queue(writer):
+    writer.batch_size, writer.flush_interval_ms = 100, 10000
+    for r in records(4):
+        writer.enqueue(r)
+    writer.stop()
+    assert [r for batch in writer.out for r in batch] == records(4)
+
+
+def test_unknown_overflow_policy_is_rejected():
+    app = Flask(__name__)
+    app.config["LOG_OVERFLOW_POLICY"] = "spill"
+    with pytest.raises(ValueError):
+        LogWriter().init_app(app)
@@ -0,0 +1,118 @@
+import pytest
+from flask import Flask
+from app.quotas import QuotaTable, parse, retry_after_header
+
+
+def make_table(slots=8):
+    app = Flask(__name__)
+    app.config["QUOTA_SLOTS"] = slots
+    table = QuotaTable()
+    table.init_app(app)
+    return table
+
+
+# — admission —
+def test_rate_limit_allows_burst_then_429():
+    table = make_table()
+    assert table.admit(1, rate=1.0, burst=2, max_in_flight=None) == (None, 0.0)
+    assert table.admit(1, rate=1.0, burst=2, max_in_flight=None) == (None, 0.0)
+    status, retry_after = table.admit(1, rate=1.0, burst=2, max_in_flight=None)
+    assert status == 429 and 0 < retry_after <= 1.0
+    assert table.stats()["rejected_rate"] == 1
+
+
+def test_in_flight_limit_until_release():
+    table = make_table()
+    assert table.admit(1, None, None, 1) == (None, 0.0)
+    assert table.admit(1, None, None, 1)[0] == 503
+    table.release(1)
+    assert table.admit(1, None, None, 1) == (None, 0.0)
+    assert table.usage(1) == {"tokens": None, "in_flight": 1}
+
+
+def test_projects_have_separate_buckets():
+    table = make_table()
+    assert table.admit(1, 1.0, 1, None) == (None, 0.0)
+    assert table.admit(1, 1.0, 1, None)[0] == 429
+    assert table.admit(2, 1.0, 1, None) == (None, 0.0)
+
+
+# — slots —
+def test_usage_does_not_claim_a_slot():
+    table = make_table(slots=1)
+    assert table.usage(1) == {"tokens": None, "in_flight": 0}
+    assert table.admit(2, 1.0, 1, None) == (None, 0.0)
+    assert table.stats()["unlimited_full"] == 0
+
+
+def test_full_table_leaves_projects_unlimited():
+    table = make_table(slots=2)
+    table.admit(1, 1.0, 1, None)
+    table.admit(2, 1.0, 1, None)
+    for _ in range(3):
+        assert table.admit(3, 1.0, 1, None) == (None, 0.0)
+    assert table.stats()["unlimited_full"] == 3
+
+
+def test_reset_frees_the_slot():
+    table = make_table(slots=1)
+    table.admit(1, 1.0, 1, None)
+    assert table.admit(1, 1.0, 1, None)[0] == 429
+    table.reset(1)
+    assert table.usage(1) == {"tokens": None, "in_flight": 0}
+    assert table.admit(2, 1.0, 1, None) == (None, 0.0)
+    assert table.admit(2, 1.0, 1, None)[0] == 429
+    assert table.stats()["unlimited_full"] == 0
+
+
+def test_probe_walks_past_freed_slots():
+    # 1 and 5 both start at slot 1, so 5 is placed after it
+    table = make_table(slots=4)
+    table.admit(1, 1.0, 1, None)
+    table.admit(5, 1.0, 1, None)
+    assert table.admit(5, 1.0, 1, None)[0] == 429
+    table.reset(1)
+    # as seen from a worker that has not cached the slot yet
+    table._index.clear()
+    assert table.admit(5, 1.0, 1, None)[0] == 429
+
+
+def test_slot_freed_elsewhere_is_claimed_again():
+    table = make_table(slots=4)
+    table.admit(1, None, None, 1)
+    table.release(1)
+    cached = dict(table._index)
+    table.reset(1)
+    # another worker reset it, but this one still has the old position cached
+    table._index.update(cached)
+    assert table.admit(1, None, None, 1) == (None, 0.0)
+    assert table.usage(1)["in_flight"] == 1
+
+
+def test_uninitialised_table_admits_everything():
+    table = QuotaTable()
+    assert table.admit(1, 1.0, 1, 1) == (None, 0.0)
+    assert table.usage(1) == {"tokens": None, "in_flight": 0}
+
+
+# — parsing —
+def test_parse_values():
+    assert parse({}) == (None, None, None)
+    assert parse({"rate_limit_rps": 0, "max_in_flight": 0}) == (None, None, None)
+    assert parse({"rate_limit_rps": "2.5", "burst": 5, "max_in_flight": 3}) == (2.5, 5, 3)
+
+
+@pytest.mark.parametrize("data", [
+    {"rate_limit_rps": -1},
+    {"rate_limit_rps": True},
+    {"burst": 5},
+    {"max_in_flight": "many"},
+])
+def test_parse_rejects(data):
+    with pytest.raises(ValueError):
+        parse(data)
+
+
+@pytest.mark.parametrize("seconds, header", [(0, "1"), (0.2, "1"), (1.0, "1"), (2.5, "3")])
+def test_retry_after_header(seconds, header):
+    assert retry_after_header(seconds) == header
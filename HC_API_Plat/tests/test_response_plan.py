@@ -0,0 +1,77 @@
+from collections import Counter
+from types import SimpleNamespace
+import pytest
+from app import response_plan
+from app.response_plan import ResponseEntry, ResponsePlan
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    response_plan.seed("1234")
+    yield
+    response_plan.seed(None)
+
+
+def make_plan(weights):
+    return ResponsePlan([ResponseEntry(str(i), 200, {}, 0.0) for i in range(len(weights))],
+                        weights=weights)
+
+
+def draw(plan, n):
+    return Counter(plan.choose().template for _ in range(n))
+
+
+# — weighted selection —
+def test_follows_weights():
+    counts = draw(make_plan([70, 20, 10]), 20000)
+    assert abs(counts["0"] / 20000 - 0.70) < 0.02
+    assert abs(counts["1"] / 20000 - 0.20) < 0.02
+    assert abs(counts["2"] / 20000 - 0.10) < 0.02
+
+
+def test_zero_weight_is_never_chosen():
+    counts = draw(make_plan([50, 0, 50]), 5000)
+    assert counts["1"] == 0
+
+
+def test_no_usable_weights_means_uniform():
+    counts = draw(make_plan([0, 0, 0, 0]), 20000)
+    for i in range(4):
+        assert abs(counts[str(i)] / 20000 - 0.25) < 0.02
+
+
+def test_same_seed_same_sequence():
+    plan = make_plan([10, 30, 60])
+    first = [plan.choose().template for _ in range(50)]
+    response_plan.seed("1234")
+    assert [plan.choose().template for _ in range(50)] == first
+
+
+def test_single_entry_and_empty_plan():
+    assert make_plan([5]).choose().template == "0"
+    assert ResponsePlan([]).choose() is None
+
+
+# — for_rule —
+def rule(body_template, status_code=200, headers=None):
+    return SimpleNamespace(body_template=body_template, status_code=status_code,
+                           headers=headers, delay_seconds=0.0, latency=None)
+
+
+def test_for_rule_weighted_entries():
+    plan = ResponsePlan.for_rule(rule([
+        {"template": "ok", "weight": 100, "delay_ms": 250},
+        {"template": "{{request.path}}", "weight": 0, "status_code": 500},
+        "not an entry",
+    ], headers={"X-Rule": "1"}))
+    ok, err = plan.entries
+    assert (ok.status_code, ok.headers, ok.delay) == (200, {"X-Rule": "1"}, 0.25)
+    assert ok.static is not None and ok.static_bytes == ok.static.encode("utf-8")
+    assert err.status_code == 500 and err.static is None
+    assert all(plan.choose() is ok for _ in range(200))
+
+
+def test_for_rule_single_template():
+    plan = ResponsePlan.for_rule(rule({"template": "hello"}, status_code=201))
+    assert len(plan.entries) == 1
+    assert plan.choose().status_code == 201
@@ -0,0 +1,120 @@
+import re
+import json
+import pytest
+from app.rule_io import (DocumentError, normalize_rule, parse_document, rule_key,
+                         strip_base_path)
+from app.utils import request_body_hash
+
+
+def weighted(*weights):
+    return {"method": "GET", "path_regex": "/w", "response_type": "weighted",
+            "body_template": [{"template": str(w), "weight": w} for w in weights]}
+
+
+# — normalize_rule —
+def test_plain_rule():
+    row = normalize_rule({"method": "post", "path_regex": "/orders/\\d+",
+                          "request_body": {"b": 1, "a": 2}, "status_code": "201",
+                          "headers": {"X-A": "1"}, "body_template": {"template": "ok"},
+                          "delay_ms": 20}, project_id=7)
+    assert row["project_id"] == 7 and row["method"] == "POST"
+    assert row["request_body_hash"] == request_body_hash({"a": 2, "b": 1})
+    assert row["status_code"] == 201 and row["delay_ms"] == 20
+    assert row["body_template"]["template"] == "ok"
+    assert row["enabled"] is True
+
+
+def test_weighted_rule():
+    row = normalize_rule(weighted(70, 30), 1)
+    assert [e["weight"] for e in row["body_template"]] == [70, 30]
+    assert row["status_code"] == 200
+
+
+def test_weighted_rule_from_a_json_string():
+    raw = weighted(100)
+    raw["body_template"] = json.dumps(raw["body_template"])
+    assert normalize_rule(raw, 1)["body_template"] == [{"template": "100", "weight": 100}]
+
+
+@pytest.mark.parametrize("raw, message", [
+    ("GET /", "Rule must be an object"),
+    ({"method": "TRACE", "path_regex": "/"}, "method must be one of"),
+    ({"method": "GET"}, "path_regex is required"),
+    ({"method": "GET", "path_regex": "/("}, "Invalid path_regex"),
+    ({"method": "GET", "path_regex": "/", "request_body": [1]}, "request_body must be"),
+    ({"method": "GET", "path_regex": "/", "status_code": 99}, "status_code must be >= 100"),
+    ({"method": "GET", "path_regex": "/", "status_code": True}, "status_code must be an integer"),
+    ({"method": "GET", "path_regex": "/", "delay": "soon"}, "delay must be an integer"),
+    ({"method": "GET", "path_regex": "/", "headers": ["X-A"]}, "headers must be an object"),
+    ({"method": "GET", "path_regex": "/", "body_template": {"template": 5}},
+     "template must be a string"),
+    ({"method": "GET", "path_regex": "/", "response_type": "weighted", "body_template": "["},
+     "Invalid JSON for weighted responses"),
+    ({"method": "GET", "path_regex": "/", "response_type": "weighted", "body_template": []},
+     "non-empty array"),
+    ({"method": "GET", "path_regex": "/", "body_template": [{"template": "x"}]},
+     "requires a weight"),
+    (weighted(60, 30), "Total weight must equal 100% (got 90%)"),
+])
+def test_invalid_rules(raw, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        normalize_rule(raw, 1)
+
+
+def test_rule_key_ignores_method_case():
+    assert rule_key("get", "/a", None) == rule_key("GET", "/a", None)
+
+
+# — parse_document —
+def test_json_array_and_wrapped_export():
+    rules = [{"method": "GET", "path_regex": "/a"}]
+    assert parse_document(json.dumps(rules).encode(), None) == ("json", rules)
+    assert parse_document(json.dumps({"rules": rules}).encode(), None) == ("json", rules)
+
+
+def test_ndjson_is_sniffed():
+    raw = b'{"method": "GET", "path_regex": "/a"}\n\n{"method": "PUT", "path_regex": "/b"}\n'
+    fmt, rules = parse_document(raw, None)
+    assert fmt == "ndjson" and [r["path_regex"] for r in rules] == ["/a", "/b"]
+
+
+def test_ndjson_reports_the_bad_line():
+    with pytest.raises(DocumentError, match="line 2"):
+        parse_document(b'{"path_regex": "/a"}\n{nope\n', "ndjson")
+
+
+def test_openapi_paths_become_rules():
+    doc = {"openapi": "3.0.0", "paths": {"/users/{id}": {"get": {"responses": {"200": {
+        "content": {"application/json": {"example": {"id": 1}}}}}}}}}
+    fmt, rules = parse_document(json.dumps(doc).encode(), None)
+    assert fmt == "openapi"
+    row = normalize_rule(rules[0], 1)
+    assert row["path_regex"] == "/users/[^/]+"
+    assert json.loads(row["body_template"]["template"]) == {"id": 1}
+
+
+def test_har_entries_become_rules():
+    doc = {"log": {"entries": [{
+        "request":  {"method": "post", "url": "https://x.test/api/v1/items?q=1",
+                     "postData": {"text": '{"a": 1}'}},
+        "response": {"status": 201, "headers": [{"name": "Date", "value": "today"},
+                                                {"name": "X-Id", "value": "9"}],
+                     "content": {"text": "created"}},
+    }]}}
+    fmt, rules = parse_document(json.dumps(doc).encode(), None)
+    strip_base_path(rules, "/api/v1")
+    row = normalize_rule(rules[0], 1)
+    assert fmt == "har"
+    assert (row["method"], row["path_regex"], row["status_code"]) == ("POST", "/items", 201)
+    assert row["request_body"] == {"a": 1} and row["headers"] == {"X-Id": "9"}
+
+
+@pytest.mark.parametrize("raw, fmt", [
+    (b"{}", "har"),
+    (b'{"openapi": "3.0.0"}', None),
+    (b'"just a string"', None),
+    (b"{nope", "json"),
+])
+def test_unreadable_documents(raw, fmt):
+    with pytest.raises(DocumentError):
+        parse_document(raw, fmt)